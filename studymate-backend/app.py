@@ -1,20 +1,46 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, g, request, jsonify, session
 from flask_cors import CORS
 import os
 import re
+import time
+import logging
 from datetime import datetime
-from pymongo import MongoClient
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from importlib.machinery import ModuleSpec
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
-import secrets
+from config import get_config
+from logging_setup import configure_logging
+from metrics import REGISTRY, REQUEST_SECONDS, CONTENT_TYPE, SamplingProfiler
+from mongo import MongoConnection
+from jobs import JobQueue
+from storage import BlobStore, FlashcardCache, TextCache
+from cards import FlashcardStore
+from stats import UserStats
+from google_auth import GoogleTokenVerifier
+from db_indexes import ensure_indexes
+from pagination import InvalidCursor, encode_cursor, decode_cursor, page_limit, ndjson_response
+from ingest import iter_page_sentences
+from document_parser import extract_pages, is_supported
+from generation import TieredGenerator, TIERS
+import inference_scheduler
+
+# worker processes started with spawn or forkserver (the NLP pool, page
+# extraction) re-import __main__. Run as python app.py, every one of them
+# would connect to Mongo, resume jobs and start pools of its own. A spec
+# named __main__ tells multiprocessing not to re-import it
+if __name__ == '__main__':
+    __spec__ = ModuleSpec('__main__', None, origin=__file__)
 
 # load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY', secrets.token_hex(32))
+# debug and production settings, picked by STUDYMATE_ENV
+app.config.from_object(get_config())
+
+# leveled logs to stderr, json lines in production
+configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+log = logging.getLogger(__name__)
 
 # configure CORS - allow frontend to talk to backend
 CORS(app, supports_credentials=True, origins=['http://localhost:3000'])
@@ -25,75 +51,216 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB limit
 
-# connect to MongoDB
+# connect to MongoDB, retries with backoff and raises if it stays unreachable
+mongo = MongoConnection()
+log.info("Connecting to MongoDB at: %s", mongo.uri)
 try:
-    MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-    print(f"Connecting to MongoDB at: {MONGODB_URI}")
-    
-    mongo_client = MongoClient(MONGODB_URI)
-    # test connection
-    mongo_client.admin.command('ping')
-    
-    db = mongo_client['studymate']
-    users_collection = db['users']
-    files_collection = db['files']
-    flashcards_collection = db['flashcards']
-    
-    print("Connected to MongoDB successfully!")
+    mongo.connect()
 except Exception as e:
-    print(f" MongoDB connection error: {e}")
-    print("Make sure MongoDB is running on your system")
+    log.error("MongoDB connection error: %s. Make sure MongoDB is running on your system", e)
+    raise
+
+db = mongo.db
+users_collection = mongo.collection('users', 'durable')
+files_collection = mongo.collection('files', 'durable')
+flashcards_collection = mongo.collection('flashcards')
+jobs_collection = mongo.collection('jobs', 'relaxed')
+blobs_collection = mongo.collection('blobs', 'durable')
+flashcard_cache_collection = mongo.collection('flashcard_cache', 'relaxed')
+text_cache_collection = mongo.collection('text_cache', 'relaxed')
+user_stats_collection = mongo.collection('user_stats')
+
+log.info("Connected to MongoDB successfully!")
+
+# create indexes the routes rely on
+ensure_indexes(db)
+
+# content-addressed upload storage and flashcard result cache
+blob_store = BlobStore(os.path.join(UPLOAD_FOLDER, 'blobs'), blobs_collection)
+flashcard_cache = FlashcardCache(flashcard_cache_collection)
+# text extracted from pdf/docx/pptx uploads, reused when the generator changes
+text_cache = TextCache(text_cache_collection)
+user_stats = UserStats(user_stats_collection, files_collection, flashcards_collection)
+card_store = FlashcardStore(flashcards_collection, files_collection, user_stats)
 
 # Google OAuth client ID
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID', '268330777379-evaefa7i8q2gl0tpeuakj2qdi6sdunj7.apps.googleusercontent.com')
 
+# verifies ID tokens with cached signing certs, GOOGLE_CERTS_FILE loads them from disk
+google_verifier = GoogleTokenVerifier(GOOGLE_CLIENT_ID, certs_file=os.getenv('GOOGLE_CERTS_FILE'))
+
+# bump when any tier's generation changes so cached results are not reused
+GENERATOR_VERSION = '5'
+
 # simple NLP function to generate flashcards
 def generate_flashcards(text):
-    print("Generating flashcards...")
-    cards = []
-    
     # split text into sentences
     sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+    return generate_flashcards_from_sentences(sentences)
+
+# same as generate_flashcards over an iterable of sentences, used for streamed uploads
+def generate_flashcards_from_sentences(sentences):
+    return generate_flashcards_from_pages((None, sentence) for sentence in sentences)
+
+# generate flashcards from (page, sentence) pairs, cards remember their page
+def generate_flashcards_from_pages(page_sentences):
+    cards = []
     
-    print(f"Found {len(sentences)} sentences")
+    # first sentences, kept for generic cards
+    first_sentences = []
+    sentence_count = 0
     
     # look for patterns to create Q&A
-    for sentence in sentences:
+    for page, sentence in page_sentences:
+        sentence = sentence.strip().rstrip('.!?').strip()
+        if len(sentence) <= 20:
+            continue
+        
+        sentence_count += 1
+        if len(first_sentences) < 5:
+            first_sentences.append((page, sentence))
+        
         lower = sentence.lower()
+        card = None
         
         # pattern: "X is Y"
         if ' is ' in lower:
             parts = re.split(r'\s+is\s+', sentence, maxsplit=1, flags=re.IGNORECASE)
             if len(parts) == 2:
-                cards.append({
+                card = {
                     'question': f'What is {parts[0].strip()}?',
-                    'answer': parts[1].strip()
-                })
+                    'answer': parts[1].strip(),
+                    'type': 'definition'
+                }
         
         # pattern: "X are Y"
         elif ' are ' in lower:
             parts = re.split(r'\s+are\s+', sentence, maxsplit=1, flags=re.IGNORECASE)
             if len(parts) == 2:
-                cards.append({
+                card = {
                     'question': f'What are {parts[0].strip()}?',
-                    'answer': parts[1].strip()
-                })
+                    'answer': parts[1].strip(),
+                    'type': 'definition'
+                }
+        
+        if card:
+            if page is not None:
+                card['page'] = page
+            cards.append(card)
     
     # if no patterns found, create generic flashcards
     if len(cards) == 0:
-        print("No patterns found, creating generic cards")
-        for i, sentence in enumerate(sentences[:5]):
-            cards.append({
+        log.debug("No patterns found in %d sentences, creating generic cards", sentence_count)
+        for i, (page, sentence) in enumerate(first_sentences):
+            card = {
                 'question': f'What is key concept {i+1}?',
-                'answer': sentence.strip()
-            })
+                'answer': sentence,
+                'type': 'concept'
+            }
+            if page is not None:
+                card['page'] = page
+            cards.append(card)
     
-    print(f"Generated {len(cards)} flashcards")
+    log.debug("Generated %d flashcards from %d sentences", len(cards), sentence_count)
     return cards
 
+# fast (regex), standard (spaCy and rules) or full (adds T5 and semantic dedup),
+# uploads can ask for another tier with a tier form field
+DEFAULT_TIER = app.config['GENERATION_TIER']
+if DEFAULT_TIER not in TIERS:
+    raise ValueError(f"GENERATION_TIER must be one of {', '.join(TIERS)}")
+
+# the NLP tiers run in worker processes with NLP_POOL, in the job threads otherwise
+nlp_pool = None
+if app.config['NLP_POOL']:
+    from nlp_workers import get_pool
+    nlp_pool = get_pool()
+tiered_generator = TieredGenerator(generate_flashcards_from_pages, pool=nlp_pool)
+
+# cached cards are keyed by the tier that produced them
+def cache_version(tier):
+    return f"{tier}-{GENERATOR_VERSION}"
+
+# only generated cards are cached, placeholders are cheap
+def is_cacheable(filename):
+    return is_supported(filename)
+
+# build flashcards for a saved upload, runs inside the job queue
+def extract_flashcards(job):
+    filepath = job['filepath']
+    filename = job['filename']
+    content_hash = job.get('content_hash')
+    tier = job.get('tier', DEFAULT_TIER)
+    
+    # an identical upload may have finished while this job was queued
+    if content_hash and is_cacheable(filename):
+        cached = flashcard_cache.get(content_hash, cache_version(tier), tiered_generator.max_cards)
+        if cached is not None:
+            return cached
+    
+    # generate flashcards for txt, pdf, docx and pptx files
+    flashcards = []
+    used = tier
+    if is_supported(filename):
+        try:
+            # stream text page by page from the stored upload instead of reading it whole,
+            # a fallback tier opens the upload again (the text cache usually has it by then)
+            def open_pages():
+                return iter_page_sentences(extract_pages(filepath, filename, text_cache, content_hash))
+            flashcards, used = tiered_generator.generate(open_pages, tier)
+        except Exception as e:
+            log.exception("Error reading file %s: %s", filename, e)
+    else:
+        # placeholder for other file types
+        flashcards = [
+            {'question': 'What is the main topic?', 'answer': 'Review the document for details.', 'type': 'placeholder'},
+            {'question': 'Key concept?', 'answer': 'Upload .txt, .pdf, .docx or .pptx files for auto-generated cards.', 'type': 'placeholder'}
+        ]
+    
+    # tier that actually ran, lower than requested after a fallback
+    jobs_collection.update_one({'_id': job['_id']}, {'$set': {'tier_used': used}})
+    
+    if content_hash and is_cacheable(filename) and flashcards:
+        flashcard_cache.put(content_hash, cache_version(used), tiered_generator.max_cards, flashcards)
+    
+    return flashcards
+
+# background flashcard generation
+job_queue = JobQueue(
+    jobs_collection,
+    card_store,
+    extract_flashcards,
+    workers=int(os.getenv('JOB_WORKERS', '2')),
+    sweep_interval=float(os.getenv('JOB_SWEEP_INTERVAL', '60'))
+)
+job_queue.resume_pending()
+
+# time every request, ?profile=1 samples its stack when PROFILING is on
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiler = None
+    if app.config['PROFILING'] and request.args.get('profile') == '1':
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.get('request_started', time.perf_counter()),
+                            method=request.method, route=route, status=response.status_code)
+    
+    profiler = g.get('profiler')
+    if profiler is not None:
+        # collapsed stacks, feed to flamegraph.pl or speedscope
+        return Response(profiler.stop().collapsed(), mimetype='text/plain')
+    return response
+
+# route: prometheus metrics of this process
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 # route: google login
 @app.route('/api/google-login', methods=['POST'])
 def google_login():
@@ -105,12 +272,7 @@ def google_login():
             return jsonify({'status': 'error', 'message': 'No token provided'}), 400
         
         # verify google token
-        print("Verifying Google token...")
-        idinfo = id_token.verify_oauth2_token(
-            token,
-            google_requests.Request(),
-            GOOGLE_CLIENT_ID
-        )
+        idinfo = google_verifier.verify(token)
         
         # extract user info
         user_id = idinfo['sub']
@@ -118,7 +280,7 @@ def google_login():
         name = idinfo.get('name')
         picture = idinfo.get('picture')
         
-        print(f"Google login: {email}")
+        log.info("Google login: %s", email)
         
         # check if user exists in database
         user = users_collection.find_one({'google_id': user_id})
@@ -134,7 +296,7 @@ def google_login():
                 'created_at': datetime.now()
             }
             users_collection.insert_one(user_doc)
-            print(f"Created new user: {email}")
+            log.info("Created new user: %s", email)
         
         # store in session
         session['user_id'] = user_id
@@ -152,10 +314,10 @@ def google_login():
         })
         
     except ValueError as e:
-        print(f"Token verification failed: {e}")
+        log.warning("Token verification failed: %s", e)
         return jsonify({'status': 'error', 'message': 'Invalid token'}), 401
     except Exception as e:
-        print(f"Google login error: {e}")
+        log.exception("Google login error: %s", e)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 # route: check if user is logged in
@@ -195,71 +357,148 @@ def upload_file():
     
     # secure the filename
     filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     
-    print(f"Uploading file: {filename}")
-    file.save(filepath)
+    tier = request.form.get('tier') or request.args.get('tier') or DEFAULT_TIER
+    if tier not in TIERS:
+        return jsonify({'status': 'error', 'message': f"Unknown tier, expected one of {', '.join(TIERS)}"}), 400
     
-    # generate flashcards if txt file
-    flashcards = []
-    if filename.endswith('.txt'):
-        try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                flashcards = generate_flashcards(content)
-        except Exception as e:
-            print(f"Error reading file: {e}")
-    else:
-        # placeholder for non-txt files
-        flashcards = [
-            {'question': 'What is the main topic?', 'answer': 'Review the document for details.'},
-            {'question': 'Key concept?', 'answer': 'Upload .txt files for auto-generated cards.'}
-        ]
+    # store by content hash, identical uploads share one blob
+    content_hash, size, filepath = blob_store.save(file.stream)
     
-    # save to MongoDB
+    # identical content was already processed
+    flashcards = None
+    if is_cacheable(filename):
+        flashcards = flashcard_cache.get(content_hash, cache_version(tier), tiered_generator.max_cards)
+    
+    # save to MongoDB, flashcards are filled in by the background job on a cache miss
     file_doc = {
         'user_id': session['user_id'],
         'user_email': session['email'],
         'filename': filename,
         'filepath': filepath,
-        'size': os.path.getsize(filepath),
+        'content_hash': content_hash,
+        'size': size,
         'upload_date': datetime.now(),
-        'flashcards': flashcards
+        'status': 'processing',
+        'flashcard_count': 0,
+        'cards_by_type': {}
     }
     
     result = files_collection.insert_one(file_doc)
-    print(f"Saved to MongoDB with ID: {result.inserted_id}")
+    user_stats.record(session['user_id'], files=1, size=size)
+    log.info("Uploaded %s as %s", filename, result.inserted_id,
+             extra={'file_id': str(result.inserted_id), 'size': size, 'tier': tier})
+    
+    if flashcards is not None:
+        card_store.save(result.inserted_id, session['user_id'], flashcards)
+        log.info("Served %d cached flashcards for %s", len(flashcards), content_hash[:12])
+        return jsonify({
+            'status': 'success',
+            'filename': filename,
+            'file_id': str(result.inserted_id),
+            'job_id': None,
+            'flashcard_count': len(flashcards)
+        })
+    
+    job_id = job_queue.submit(result.inserted_id, session['user_id'], filepath, filename,
+                              content_hash=content_hash, tier=tier)
+    files_collection.update_one({'_id': result.inserted_id}, {'$set': {'job_id': job_id}})
     
     return jsonify({
         'status': 'success',
         'filename': filename,
-        'flashcard_count': len(flashcards)
-    })
+        'file_id': str(result.inserted_id),
+        'job_id': job_id,
+        'flashcard_count': 0
+    }), 202
+
+# route: get status of a flashcard generation job
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Not authenticated'}), 401
+    
+    try:
+        job = job_queue.get(job_id, session['user_id'])
+        
+        if not job:
+            return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+        
+        return jsonify({
+            'status': 'success',
+            'job': {
+                'id': str(job['_id']),
+                'file_id': str(job['file_id']),
+                'state': job['status'],
+                'stage': job.get('stage'),
+                'progress': job.get('progress', 0),
+                'flashcard_count': job.get('flashcard_count', 0),
+                'tier': job.get('tier'),
+                'tier_used': job.get('tier_used'),
+                'error': job.get('error')
+            }
+        })
+        
+    except Exception as e:
+        log.exception("Error getting job: %s", e)
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# file fields returned by listings, never the cards
+FILE_PROJECTION = {'filename': 1, 'size': 1, 'upload_date': 1, 'status': 1, 'flashcard_count': 1}
+
+# convert a file document to JSON-friendly format
+def file_to_json(f):
+    return {
+        'id': str(f['_id']),
+        'filename': f['filename'],
+        'size': f['size'],
+        'upload_date': f['upload_date'].isoformat(),
+        'status': f.get('status', 'ready'),
+        'flashcard_count': f.get('flashcard_count', 0)
+    }
 
-# route: get user's files
+# route: get user's files, newest first
+# ?limit=N&cursor=... pages through the list, ?format=ndjson streams all of it
 @app.route('/api/files', methods=['GET'])
 def get_files():
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Not authenticated'}), 401
     
-    # find all files for this user
-    files = list(files_collection.find({'user_id': session['user_id']}))
-    
-    # convert to JSON-friendly format
-    result = []
-    for f in files:
-        result.append({
-            'id': str(f['_id']),
-            'filename': f['filename'],
-            'size': f['size'],
-            'upload_date': f['upload_date'].isoformat(),
-            'flashcard_count': len(f.get('flashcards', []))
+    from bson.objectid import ObjectId
+    
+    query = {'user_id': session['user_id']}
+    
+    # continue after the last file of the previous page
+    try:
+        position = decode_cursor(request.args.get('cursor'), upload_date=datetime.fromisoformat, id=ObjectId)
+    except InvalidCursor as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if position:
+        query['$or'] = [
+            {'upload_date': {'$lt': position['upload_date']}},
+            {'upload_date': position['upload_date'], '_id': {'$lt': position['id']}}
+        ]
+    
+    cursor = files_collection.find(query, FILE_PROJECTION).sort([('upload_date', -1), ('_id', -1)])
+    
+    if request.args.get('format') == 'ndjson':
+        return ndjson_response(file_to_json(f) for f in cursor.batch_size(100))
+    
+    limit = page_limit(request.args.get('limit'), default=50, maximum=200)
+    files = list(cursor.limit(limit + 1))
+    
+    next_cursor = None
+    if len(files) > limit:
+        files = files[:limit]
+        next_cursor = encode_cursor({
+            'upload_date': files[-1]['upload_date'].isoformat(),
+            'id': str(files[-1]['_id'])
         })
     
-    print(f"Found {len(result)} files for user")
-    return jsonify({'files': result})
+    return jsonify({'files': [file_to_json(f) for f in files], 'next_cursor': next_cursor})
 
 # route: get flashcards for a file
+# ?limit=N&cursor=... pages through the cards, ?format=ndjson streams all of them
 @app.route('/api/flashcards/<file_id>', methods=['GET'])
 def get_flashcards(file_id):
     if 'user_id' not in session:
@@ -267,27 +506,37 @@ def get_flashcards(file_id):
     
     from bson.objectid import ObjectId
     
+    try:
+        position = decode_cursor(request.args.get('cursor'), index=int)
+    except InvalidCursor as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    after_index = position['index'] if position else None
+    
     try:
         # find file by ID
         file_doc = files_collection.find_one({
             '_id': ObjectId(file_id),
             'user_id': session['user_id']
-        })
+        }, {'filename': 1})
         
         if not file_doc:
             return jsonify({'status': 'error', 'message': 'File not found'}), 404
         
-        flashcards = file_doc.get('flashcards', [])
-        print(f"Returning {len(flashcards)} flashcards")
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(card_store.iter(file_doc['_id'], after_index))
+        
+        limit = page_limit(request.args.get('limit'), default=100, maximum=500)
+        flashcards, next_index = card_store.page(file_doc['_id'], after_index, limit)
         
         return jsonify({
             'status': 'success',
             'flashcards': flashcards,
-            'filename': file_doc['filename']
+            'filename': file_doc['filename'],
+            'next_cursor': encode_cursor({'index': next_index}) if next_index is not None else None
         })
         
     except Exception as e:
-        print(f"Error getting flashcards: {e}")
+        log.exception("Error getting flashcards: %s", e)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 # route: delete file
@@ -299,8 +548,9 @@ def delete_file(file_id):
     from bson.objectid import ObjectId
     
     try:
-        # find file
-        file_doc = files_collection.find_one({
+        # delete the file document first, a job finishing now then finds
+        # it gone and neither keeps its cards nor counts them
+        file_doc = files_collection.find_one_and_delete({
             '_id': ObjectId(file_id),
             'user_id': session['user_id']
         })
@@ -308,50 +558,54 @@ def delete_file(file_id):
         if not file_doc:
             return jsonify({'status': 'error', 'message': 'File not found'}), 404
         
-        # delete from filesystem
-        if os.path.exists(file_doc['filepath']):
+        # delete from filesystem, shared blobs only when no file uses them
+        if file_doc.get('content_hash'):
+            blob_store.release(file_doc['content_hash'])
+        elif os.path.exists(file_doc['filepath']):
             os.remove(file_doc['filepath'])
         
-        # delete from database
-        files_collection.delete_one({'_id': ObjectId(file_id)})
+        deleted_cards = card_store.delete(file_doc['_id'])
+        # take back the cards the stats counted for this file, not whatever is stored
+        counted_cards = file_doc.get('cards_by_type', deleted_cards)
+        
+        # one $inc for the file, its bytes and its cards
+        user_stats.record(
+            session['user_id'],
+            files=-1,
+            size=-file_doc['size'],
+            cards_by_type={card_type: -count for card_type, count in counted_cards.items()}
+        )
         
-        print(f"Deleted file: {file_doc['filename']}")
+        log.info("Deleted file: %s", file_doc['filename'])
         return jsonify({'status': 'success'})
         
     except Exception as e:
-        print(f"Error deleting file: {e}")
+        log.exception("Error deleting file: %s", e)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+# route: health check with Mongo pool utilization
+@app.route('/api/health', methods=['GET'])
+def health():
+    return jsonify({
+        'status': 'ok',
+        'mongo_pool': mongo.pool_stats(),
+        'generation': tiered_generator.stats(),
+        'nlp_pool': nlp_pool.stats() if nlp_pool else None,
+        'inference': inference_scheduler.stats()
+    })
+
 # route: get user statistics
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Not authenticated'}), 401
     
-    # count files
-    file_count = files_collection.count_documents({'user_id': session['user_id']})
-    
-    # count total flashcards
-    pipeline = [
-        {'$match': {'user_id': session['user_id']}},
-        {'$project': {'card_count': {'$size': '$flashcards'}}},
-        {'$group': {'_id': None, 'total': {'$sum': '$card_count'}}}
-    ]
-    
-    result = list(files_collection.aggregate(pipeline))
-    card_count = result[0]['total'] if result else 0
-    
-    return jsonify({
-        'total_files': file_count,
-        'total_cards': card_count
-    })
+    # single point read of the incrementally maintained counters
+    return jsonify(user_stats.get(session['user_id']))
 
-# run the application
+# development server only, use serve.py in production
+# run: python app.py
 if __name__ == '__main__':
-    print("=" * 60)
-    print(" Starting StudyMate Flask Server with MongoDB")
-    print("=" * 60)
-    print(f" MongoDB URI: {os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')}")
-    print(f" Google OAuth: {'Configured' if GOOGLE_CLIENT_ID else 'Not configured'}")
-    print("=" * 60)
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    log.info("Starting StudyMate Flask Server with MongoDB at %s, Google OAuth %s",
+             mongo.uri, 'configured' if GOOGLE_CLIENT_ID else 'not configured')
+    app.run(debug=app.config['DEBUG'], port=app.config['PORT'], host=app.config['HOST'])
@@ -0,0 +1,102 @@
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+import inference_backends
+from benchmarks.corpus import textbook
+
+def _rss_mb() -> float:
+    """Resident memory of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return float('nan')
+
+def _timed_load(load, *args):
+    before = _rss_mb()
+    start = time.perf_counter()
+    model = load(*args)
+    return model, time.perf_counter() - start, _rss_mb() - before
+
+def _sample_texts(count: int) -> List[str]:
+    paragraphs = [p for p in textbook(64 * 1024, seed=7).split('\n\n') if len(p) > 200]
+    return paragraphs[:count]
+
+def compare_embeddings(backend: str, texts: List[str], threads=None) -> Dict:
+    """Cosine similarity of the backend's MiniLM embeddings to fp32, plus speed and memory"""
+    reference, _, _ = _timed_load(inference_backends.load_sentence_encoder, 'torch', threads)
+    candidate, load_seconds, load_mb = _timed_load(inference_backends.load_sentence_encoder, backend, threads)
+
+    def encode(model):
+        start = time.perf_counter()
+        vectors = model.encode(texts, batch_size=32, convert_to_numpy=True,
+                               normalize_embeddings=True, show_progress_bar=False)
+        return vectors, time.perf_counter() - start
+
+    expected, fp32_seconds = encode(reference)
+    actual, seconds = encode(candidate)
+    cosine = np.sum(expected * actual, axis=1)
+
+    # would dedup at 0.9 make the same keep/drop decisions
+    threshold = 0.9
+    same_pairs = ((expected @ expected.T) >= threshold) == ((actual @ actual.T) >= threshold)
+
+    return {
+        'texts': len(texts),
+        'cosine_mean': float(cosine.mean()),
+        'cosine_min': float(cosine.min()),
+        'dedup_pair_agreement': float(same_pairs.mean()),
+        'fp32_seconds': fp32_seconds,
+        'seconds': seconds,
+        'load_seconds': load_seconds,
+        'load_rss_mb': load_mb,
+    }
+
+def compare_questions(backend: str, texts: List[str], threads=None) -> Dict:
+    """Share of questions the backend's T5 generates exactly or nearly as fp32 does"""
+    reference, _, _ = _timed_load(inference_backends.load_qg_pipeline, 'torch', threads)
+    candidate, load_seconds, load_mb = _timed_load(inference_backends.load_qg_pipeline, backend, threads)
+
+    # highlight the first few words the way the generator highlights a noun chunk
+    inputs = []
+    for text in texts:
+        words = text.split()
+        inputs.append(' '.join(['<hl>'] + words[:3] + ['<hl>'] + words[3:]))
+
+    def generate(pipe):
+        start = time.perf_counter()
+        results = pipe(inputs, max_length=64, batch_size=8, truncation=True)
+        questions = [(r[0] if isinstance(r, list) else r)['generated_text'].strip() for r in results]
+        return questions, time.perf_counter() - start
+
+    expected, fp32_seconds = generate(reference)
+    actual, seconds = generate(candidate)
+
+    def overlap(a: str, b: str) -> float:
+        a_words, b_words = set(a.lower().split()), set(b.lower().split())
+        return len(a_words & b_words) / max(len(a_words | b_words), 1)
+
+    return {
+        'texts': len(texts),
+        'exact_match': sum(a == b for a, b in zip(expected, actual)) / len(texts),
+        'word_overlap_mean': float(np.mean([overlap(a, b) for a, b in zip(expected, actual)])),
+        'fp32_seconds': fp32_seconds,
+        'seconds': seconds,
+        'load_seconds': load_seconds,
+        'load_rss_mb': load_mb,
+    }
+
+def compare_backend(backend: str, count: int = 64, threads=None) -> Dict:
+    """Accuracy, speed and memory of a backend against fp32 torch on the same inputs"""
+    inference_backends.check_backend(backend)
+    texts = _sample_texts(count)
+    results = {}
+    for name, compare in (('sentence_model', compare_embeddings), ('qg_model', compare_questions)):
+        try:
+            results[name] = compare(backend, texts, threads)
+        except Exception as e:
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+    return results
@@ -0,0 +1,109 @@
+import os
+import random
+from typing import Dict, Iterator
+
+# document sizes of the standard corpus, 1 KB to 16 MB
+SIZES = {
+    '1kb': 1024,
+    '16kb': 16 * 1024,
+    '256kb': 256 * 1024,
+    '1mb': 1024 * 1024,
+    '4mb': 4 * 1024 * 1024,
+    '16mb': 16 * 1024 * 1024,
+}
+
+SUBJECTS = ['photosynthesis', 'mitochondria', 'the cell membrane', 'osmosis', 'an enzyme', 'a ribosome',
+            'natural selection', 'the nervous system', 'a neuron', 'homeostasis', 'the water cycle',
+            'plate tectonics', 'an ecosystem', 'the immune system', 'DNA replication', 'a catalyst',
+            'kinetic energy', 'an algorithm', 'a hash table', 'the French Revolution', 'inflation',
+            'supply and demand', 'a democracy', 'the Industrial Revolution', 'an isotope']
+PEOPLE = ['Charles Darwin', 'Marie Curie', 'Isaac Newton', 'Gregor Mendel', 'Ada Lovelace',
+          'Albert Einstein', 'Adam Smith', 'Rosalind Franklin', 'Alan Turing', 'Louis Pasteur']
+PLACES = ['London', 'Paris', 'the Galapagos Islands', 'Vienna', 'Cambridge', 'Berlin', 'New York']
+VERBS = ['describes', 'explains', 'controls', 'produces', 'regulates', 'transforms', 'depends on', 'affects']
+NOUNS = ['energy', 'the process', 'living organisms', 'the structure', 'chemical reactions', 'the system',
+         'the population', 'resources', 'information', 'the environment', 'proteins', 'molecules']
+ADJECTIVES = ['important', 'complex', 'essential', 'basic', 'fundamental', 'specialized', 'dynamic']
+
+def _sentence(rng: random.Random) -> str:
+    subject = rng.choice(SUBJECTS)
+    kind = rng.random()
+    if kind < 0.25:
+        # definition phrasing the extractors look for
+        verb = rng.choice(['is', 'refers to', 'means', 'can be defined as'])
+        return (f"{subject.capitalize()} {verb} a {rng.choice(ADJECTIVES)} concept that "
+                f"{rng.choice(VERBS)} {rng.choice(NOUNS)} in {rng.choice(NOUNS)}.")
+    if kind < 0.4:
+        return (f"In {rng.randint(1700, 2020)}, {rng.choice(PEOPLE)} studied {subject} in "
+                f"{rng.choice(PLACES)} and showed that it {rng.choice(VERBS)} {rng.choice(NOUNS)}.")
+    if kind < 0.55:
+        return (f"{rng.choice(NOUNS).capitalize()} {rng.choice(VERBS)} {subject} because "
+                f"{rng.choice(NOUNS)} {rng.choice(VERBS)} {rng.choice(NOUNS)}.")
+    if kind < 0.65:
+        return f"Why does {subject} matter? Because it {rng.choice(VERBS)} {rng.choice(NOUNS)}!"
+    words = [rng.choice(NOUNS + ADJECTIVES + VERBS) for _ in range(rng.randint(8, 25))]
+    return f"{subject.capitalize()} {' '.join(words)}."
+
+def textbook(size: int, seed: int = 0) -> str:
+    """Textbook-like text of about size bytes: chapters, headings and paragraphs"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    chapter = 0
+    while length < size:
+        if length == 0 or rng.random() < 0.05:
+            chapter += 1
+            heading = f"Chapter {chapter}: {rng.choice(SUBJECTS).title()}\n\n"
+            parts.append(heading)
+            length += len(heading)
+        paragraph = ' '.join(_sentence(rng) for _ in range(rng.randint(3, 8))) + '\n\n'
+        parts.append(paragraph)
+        length += len(paragraph)
+    return ''.join(parts)[:size]
+
+def no_punctuation(size: int, seed: int = 0) -> str:
+    """One run-on block without a sentence boundary anywhere"""
+    rng = random.Random(seed)
+    words = SUBJECTS + NOUNS + ADJECTIVES + VERBS + ['is', 'are']
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(words)
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)[:size]
+
+def pathological(size: int) -> Dict[str, str]:
+    """Inputs that have caused slow or broken runs before"""
+    return {
+        'no_punctuation': no_punctuation(size),
+        # one term followed by a long definition clause, stresses the definition pattern
+        'long_clause': 'The term ' + 'x' * 50 + ' is ' + 'word ' * (size // 5),
+        'only_is': ' is' * (size // 3),
+        'blank_lines': '\n\n' * (size // 2),
+        'single_word': 'a' * size,
+        'unicode': ('Die Zelle ist die kleinste Einheit des Lebens. Ηλεκτρόνιο είναι σωματίδιο. '
+                    '細胞は生命の基本単位です。 ') * (size // 150 + 1),
+    }
+
+def corpus(max_size: int = SIZES['16mb'], seed: int = 0) -> Iterator[tuple]:
+    """(name, text) of the standard textbook sizes up to max_size, then the pathological inputs"""
+    for name, size in SIZES.items():
+        if size <= max_size:
+            yield f'textbook_{name}', textbook(size, seed)
+    for name, text in pathological(min(max_size, SIZES['256kb'])).items():
+        yield name, text
+
+def write_corpus(directory: str, max_size: int = SIZES['16mb']):
+    """Write the corpus as .txt files, e.g. to upload by hand"""
+    os.makedirs(directory, exist_ok=True)
+    for name, text in corpus(max_size):
+        with open(os.path.join(directory, f'{name}.txt'), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+# run: python -m benchmarks.corpus [directory]
+if __name__ == '__main__':
+    import sys
+    target = sys.argv[1] if len(sys.argv) > 1 else 'bench_corpus'
+    write_corpus(target)
+    print(f"Wrote corpus to {target}")
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import platform
+import statistics
+import subprocess
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class StubVerifier:
+    """Accepts any token as a Google ID token for the user named by it"""
+
+    def verify(self, token: str) -> Dict:
+        return {'sub': token, 'email': f'{token}@bench.local', 'name': token, 'iss': 'accounts.google.com'}
+
+def stand_in_app(workdir: str):
+    """
+    Import app.py against an in-memory Mongo (mongomock) with a stub
+    Google verifier. Uploads are stored under workdir
+    """
+    import mongomock
+    import pymongo
+
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    # never download models in the middle of a timed run
+    os.environ.setdefault('NLP_OFFLINE', '1')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    pymongo.MongoClient = mongomock.MongoClient
+
+    import app
+    app.google_verifier = StubVerifier()
+    return app
+
+def measure(fn: Callable, repeat: int = 3) -> Dict:
+    """Run fn repeat times, returns timings in seconds and fn's last result size"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+        'runs': repeat,
+        'items': len(result) if hasattr(result, '__len__') else None,
+    }
+
+def percentiles(samples: List[float]) -> Dict:
+    """Latency summary of a list of seconds"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': pick(0.50),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+        'max': ordered[-1],
+    }
+
+def environment() -> Dict:
+    """What the numbers were measured on, to tell real regressions from noise"""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
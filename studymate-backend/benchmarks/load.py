@@ -0,0 +1,111 @@
+import io
+import time
+import logging
+import threading
+from typing import Dict, List
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.corpus import SIZES, textbook
+from benchmarks.harness import percentiles
+
+ENDPOINTS = ('login', 'upload', 'job', 'files', 'flashcards', 'stats')
+
+class LoadTest:
+    """
+    Virtual users each logging in, then repeatedly uploading a document,
+    waiting for its cards and reading files, flashcards and stats, against
+    the app served over HTTP on localhost
+    """
+
+    def __init__(self, app_module, users: int = 8, iterations: int = 5, doc_size: int = SIZES['16kb'],
+                 tier: str = None, job_timeout: float = 60.0):
+        self.app_module = app_module
+        self.users = users
+        self.iterations = iterations
+        self.doc_size = doc_size
+        self.tier = tier
+        self.job_timeout = job_timeout
+
+        self.latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in ENDPOINTS}
+        self.job_seconds: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def _call(self, endpoint: str, method, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = method(url, timeout=60, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self._record(endpoint, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def _user(self, base: str, index: int):
+        session = requests.Session()
+        if not self._call('login', session.post, f'{base}/api/google-login', json={'credential': f'bench-{index}'}):
+            return
+
+        for iteration in range(self.iterations):
+            # distinct content per upload so the flashcard cache doesn't answer
+            document = textbook(self.doc_size, seed=index * 1000 + iteration).encode('utf-8')
+            data = {'tier': self.tier} if self.tier else {}
+            started = time.perf_counter()
+            response = self._call('upload', session.post, f'{base}/api/upload', data=data,
+                                  files={'file': (f'doc-{index}-{iteration}.txt', io.BytesIO(document))})
+            if response is None:
+                continue
+            upload = response.json()
+
+            if upload.get('job_id'):
+                while time.perf_counter() - started < self.job_timeout:
+                    job = self._call('job', session.get, f"{base}/api/jobs/{upload['job_id']}")
+                    if job is None or job.json()['job']['state'] in ('done', 'failed'):
+                        break
+                    time.sleep(0.05)
+            with self._lock:
+                self.job_seconds.append(time.perf_counter() - started)
+
+            self._call('files', session.get, f'{base}/api/files')
+            self._call('flashcards', session.get, f"{base}/api/flashcards/{upload['file_id']}")
+            self._call('stats', session.get, f'{base}/api/stats')
+
+    def run(self) -> Dict:
+        # the dev server logs every request at info level
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        server = make_server('127.0.0.1', 0, self.app_module.app, threaded=True)
+        base = f'http://127.0.0.1:{server.server_port}'
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+
+        started = time.perf_counter()
+        try:
+            users = [threading.Thread(target=self._user, args=(base, i)) for i in range(self.users)]
+            for user in users:
+                user.start()
+            for user in users:
+                user.join()
+        finally:
+            elapsed = time.perf_counter() - started
+            server.shutdown()
+
+        requests_made = sum(len(samples) for samples in self.latencies.values())
+        return {
+            'users': self.users,
+            'iterations': self.iterations,
+            'doc_size': self.doc_size,
+            'tier': self.tier,
+            'elapsed': elapsed,
+            'requests_per_second': requests_made / elapsed if elapsed else None,
+            'endpoints': {endpoint: percentiles(samples) for endpoint, samples in self.latencies.items()},
+            'upload_to_cards': percentiles(self.job_seconds),
+            'errors': self.errors,
+        }
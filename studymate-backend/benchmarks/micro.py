@@ -0,0 +1,54 @@
+from typing import Dict
+
+from benchmarks.corpus import corpus
+from benchmarks.harness import measure
+
+def bench_regex(app, max_size: int, repeat: int = 3) -> Dict:
+    """The fast tier: regex generate_flashcards in app.py"""
+    results = {}
+    for name, text in corpus(max_size):
+        results[name] = measure(lambda: app.generate_flashcards(text), repeat)
+    return results
+
+def bench_extractors(max_size: int, repeat: int = 3) -> Dict:
+    """
+    Each FlashcardGenerator stage over one shared parse. Stages whose
+    component is not installed are reported as skipped
+    """
+    from nlp_processor import FlashcardGenerator
+
+    generator = FlashcardGenerator()
+    generator.warmup()
+    results = {}
+
+    for name, text in corpus(max_size):
+        doc = {}
+        try:
+            doc['parse'] = measure(lambda: generator.parse(text), repeat)
+        except Exception as e:
+            # e.g. spaCy's max_length on the largest inputs
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+            continue
+        parsed = generator.parse(text)
+
+        stages = {
+            'definitions': lambda: generator._extract_definitions(parsed),
+            'entities': (lambda: generator._extract_entities(parsed)) if generator.nlp else None,
+            'concepts': lambda: generator._extract_key_concepts(parsed),
+            'ai_questions': (lambda: generator._generate_ai_questions(parsed)) if generator.qg_model else None,
+            'relationships': (lambda: generator._extract_relationships(parsed)) if generator.nlp else None,
+        }
+        cards = []
+        for stage, fn in stages.items():
+            if fn is None:
+                doc[stage] = {'skipped': 'component not available'}
+                continue
+            doc[stage] = measure(fn, repeat)
+            cards.extend(fn())
+
+        doc['dedup'] = measure(lambda: generator._deduplicate_cards(cards), repeat)
+        unique = generator._deduplicate_cards(cards)
+        doc['rank'] = measure(lambda: generator._rank_cards(unique), repeat)
+        results[name] = doc
+
+    return results
@@ -0,0 +1,102 @@
+import sys
+import json
+import argparse
+import tempfile
+
+from benchmarks.corpus import SIZES
+from benchmarks.harness import environment, stand_in_app
+
+# metrics compared between runs, lower is better for all of them
+COMPARED = ('median', 'p95')
+
+def _flatten(results, prefix=''):
+    """path -> value for every compared number in a results tree"""
+    values = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            path = f'{prefix}.{key}' if prefix else key
+            if key in COMPARED and isinstance(value, (int, float)):
+                values[path] = value
+            else:
+                values.update(_flatten(value, path))
+    return values
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """Print timings that changed by more than threshold, returns 1 on a regression"""
+    with open(old_path) as f:
+        old = _flatten({k: v for k, v in json.load(f).items() if k != 'environment'})
+    with open(new_path) as f:
+        new = _flatten({k: v for k, v in json.load(f).items() if k != 'environment'})
+
+    regressions = 0
+    for path in sorted(old.keys() & new.keys()):
+        before, after = old[path], new[path]
+        if before <= 0:
+            continue
+        change = (after - before) / before
+        if abs(change) >= threshold:
+            marker = 'SLOWER' if change > 0 else 'faster'
+            regressions += change > 0
+            print(f"{marker:6} {change:+7.1%}  {path}: {before * 1000:.2f}ms -> {after * 1000:.2f}ms")
+
+    print(f"{regressions} regressions over {threshold:.0%} in {len(old.keys() & new.keys())} timings")
+    return 1 if regressions else 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='StudyMate generation and API benchmarks')
+    parser.add_argument('suite', choices=['micro', 'load', 'all', 'accuracy', 'compare'])
+    parser.add_argument('files', nargs='*', help='compare: old.json new.json')
+    parser.add_argument('--out', help='write results as JSON to this file')
+    parser.add_argument('--max-size', choices=list(SIZES), default='1mb', help='largest corpus document')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--doc-size', choices=list(SIZES), default='16kb')
+    parser.add_argument('--tier', choices=['fast', 'standard', 'full'])
+    parser.add_argument('--backend', choices=['int8', 'onnx'], default='int8', help='accuracy: backend compared to fp32')
+    parser.add_argument('--threads', type=int, help='accuracy: intra-op threads')
+    parser.add_argument('--threshold', type=float, default=0.10, help='compare: relative change to report')
+    args = parser.parse_args(argv)
+
+    if args.suite == 'compare':
+        if len(args.files) != 2:
+            parser.error('compare needs two result files')
+        return compare(args.files[0], args.files[1], args.threshold)
+
+    if args.suite == 'accuracy':
+        from benchmarks.accuracy import compare_backend
+        results = {'environment': environment(), 'args': vars(args),
+                   'accuracy': compare_backend(args.backend, threads=args.threads)}
+        return _write(results, args.out)
+
+    # the app writes uploads to its working directory
+    app = stand_in_app(tempfile.mkdtemp(prefix='studymate-bench-'))
+    results = {'environment': environment(), 'args': vars(args)}
+
+    if args.suite in ('micro', 'all'):
+        from benchmarks.micro import bench_extractors, bench_regex
+        results['regex'] = bench_regex(app, SIZES[args.max_size], args.repeat)
+        results['extractors'] = bench_extractors(SIZES[args.max_size], args.repeat)
+
+    if args.suite in ('load', 'all'):
+        from benchmarks.load import LoadTest
+        results['load'] = LoadTest(app, args.users, args.iterations, SIZES[args.doc_size], args.tier).run()
+
+    app.job_queue.shutdown(wait=False, cancel_pending=True)
+    return _write(results, args.out)
+
+def _write(results, out) -> int:
+    output = json.dumps(results, indent=2, default=str)
+    if out:
+        with open(out, 'w') as f:
+            f.write(output)
+        print(f"Wrote results to {out}")
+    else:
+        print(output)
+    return 0
+
+# run: python -m benchmarks.run micro|load|all [--out results.json]
+#      python -m benchmarks.run accuracy --backend int8|onnx
+#      python -m benchmarks.run compare old.json new.json
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+from pymongo import ReturnDocument
+from stats import count_by_type
+from typing import List, Dict, Iterator, Optional, Tuple
+
+# card fields returned to clients
+CARD_PROJECTION = {'_id': 0, 'question': 1, 'answer': 1, 'page': 1}
+
+class FlashcardStore:
+    """
+    Flashcards stored one document per card in the flashcards collection,
+    keyed by file id and position. The file document keeps a denormalized
+    flashcard_count so listings never touch the cards.
+    """
+
+    def __init__(self, flashcards_collection, files_collection, user_stats=None):
+        self.cards = flashcards_collection
+        self.files = files_collection
+        # UserStats kept in step with card inserts and deletes
+        self.user_stats = user_stats
+
+    def count_by_type(self, file_id) -> Dict[str, int]:
+        """Number of stored cards of a file per card type"""
+        rows = self.cards.aggregate([
+            {'$match': {'file_id': file_id}},
+            {'$group': {'_id': {'$ifNull': ['$type', 'other']}, 'count': {'$sum': 1}}}
+        ])
+        return {row['_id']: row['count'] for row in rows}
+
+    def save(self, file_id, user_id: str, flashcards: List[Dict]) -> bool:
+        """
+        Replace the cards of a file and mark it ready. Returns False, and
+        keeps no cards, when the file was deleted before they were written
+        """
+        # a re-run job must not leave the previous run's cards behind
+        previous = self.count_by_type(file_id)
+        self.cards.delete_many({'file_id': file_id})
+        if flashcards:
+            self.cards.insert_many([
+                dict(card, file_id=file_id, user_id=user_id, index=i)
+                for i, card in enumerate(flashcards)
+            ])
+
+        # written after the cards, a file deleted meanwhile no longer matches.
+        # the file keeps the card counts its user's stats include, which
+        # delete_file takes back
+        cards_by_type = count_by_type(flashcards)
+        before = self.files.find_one_and_update(
+            {'_id': file_id},
+            {'$set': {'flashcard_count': len(flashcards), 'cards_by_type': cards_by_type, 'status': 'ready'}},
+            projection={'cards_by_type': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            # delete_file may have run before the insert, remove what it missed
+            self.cards.delete_many({'file_id': file_id})
+            return False
+
+        if self.user_stats:
+            # files saved before cards_by_type was kept fall back to the counted cards
+            change = {card_type: -count for card_type, count in before.get('cards_by_type', previous).items()}
+            for card_type, count in cards_by_type.items():
+                change[card_type] = change.get(card_type, 0) + count
+            self.user_stats.record(user_id, cards_by_type=change)
+        return True
+
+    def mark_failed(self, file_id):
+        self.files.update_one({'_id': file_id}, {'$set': {'status': 'failed'}})
+
+    def get(self, file_id) -> List[Dict]:
+        """Cards of a file in generation order"""
+        return list(self.iter(file_id))
+
+    def iter(self, file_id, after_index: Optional[int] = None, batch_size: int = 200) -> Iterator[Dict]:
+        """Stream the cards of a file in order, starting after a position"""
+        query = {'file_id': file_id}
+        if after_index is not None:
+            query['index'] = {'$gt': after_index}
+        return self.cards.find(query, CARD_PROJECTION).sort('index', 1).batch_size(batch_size)
+
+    def page(self, file_id, after_index: Optional[int], limit: int) -> Tuple[List[Dict], Optional[int]]:
+        """
+        One page of cards after a position (keyset on index).
+        Returns the cards and the position to continue from, None on the last page
+        """
+        query = {'file_id': file_id}
+        if after_index is not None:
+            query['index'] = {'$gt': after_index}
+        docs = list(self.cards.find(query, dict(CARD_PROJECTION, index=1)).sort('index', 1).limit(limit + 1))
+
+        next_index = docs[limit - 1]['index'] if len(docs) > limit else None
+        cards = [{k: v for k, v in doc.items() if k != 'index'} for doc in docs[:limit]]
+        return cards, next_index
+
+    def delete(self, file_id) -> Dict[str, int]:
+        """Delete the cards of a file, returns how many were deleted per type"""
+        counts = self.count_by_type(file_id)
+        self.cards.delete_many({'file_id': file_id})
+        return counts
@@ -0,0 +1,80 @@
+import os
+import secrets
+import multiprocessing
+from dotenv import load_dotenv
+
+# settings below are read at import, so load .env first
+load_dotenv()
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+class Config:
+    """Settings shared by every environment"""
+    HOST = os.getenv('HOST', '0.0.0.0')
+    PORT = int(os.getenv('PORT', '5000'))
+    DEBUG = False
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_UPLOAD_MB', '16')) * 1024 * 1024  # 16MB default limit
+    SESSION_COOKIE_HTTPONLY = True
+    SESSION_COOKIE_SAMESITE = 'Lax'
+
+    # text logs for people, json lines for log shippers
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    # ?profile=1 returns a sampled profile of the request instead of its response
+    PROFILING = _env_bool('PROFILING', False)
+
+    # load the NLP models before serving
+    PRELOAD_NLP = _env_bool('PRELOAD_NLP', False)
+    # flashcard tier when an upload doesn't ask for one: fast, standard or full
+    GENERATION_TIER = os.getenv('GENERATION_TIER', 'standard')
+    # run the NLP tiers in an NLPWorkerPool, meant for single-process deployments
+    NLP_POOL = _env_bool('NLP_POOL', False)
+
+    # server workers, only used by serve.py
+    WORKERS = int(os.getenv('WEB_WORKERS', '1'))
+    THREADS = int(os.getenv('WEB_THREADS', '4'))
+    # seconds a request may take before its worker is killed and restarted
+    TIMEOUT = int(os.getenv('WEB_TIMEOUT', '120'))
+    # seconds workers get to finish in-flight requests on shutdown
+    GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+    KEEPALIVE = int(os.getenv('WEB_KEEPALIVE', '5'))
+    # recycle workers after this many requests (plus jitter) to bound memory growth, 0 = never
+    MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', '0'))
+    MAX_REQUESTS_JITTER = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '0'))
+
+    @property
+    def SECRET_KEY(self):
+        return os.getenv('SECRET_KEY') or secrets.token_hex(32)
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    PROFILING = _env_bool('PROFILING', True)
+
+class ProductionConfig(Config):
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    PRELOAD_NLP = _env_bool('PRELOAD_NLP', True)
+    WORKERS = int(os.getenv('WEB_WORKERS', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+    MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', '1000'))
+    MAX_REQUESTS_JITTER = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '100'))
+    SESSION_COOKIE_SECURE = _env_bool('SESSION_COOKIE_SECURE', True)
+
+    @property
+    def SECRET_KEY(self):
+        # every worker must sign sessions with the same key, a random one per process logs users out
+        key = os.getenv('SECRET_KEY')
+        if not key:
+            raise RuntimeError("SECRET_KEY must be set when STUDYMATE_ENV=production")
+        return key
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
+
+def get_config(name: str = None) -> Config:
+    """Config profile from STUDYMATE_ENV (development by default)"""
+    name = name or os.getenv('STUDYMATE_ENV', 'development')
+    if name not in CONFIGS:
+        raise ValueError(f"Unknown STUDYMATE_ENV {name!r}, expected one of {', '.join(CONFIGS)}")
+    return CONFIGS[name]()
@@ -0,0 +1,131 @@
+import sys
+from datetime import datetime
+from typing import List, Dict
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from dotenv import load_dotenv
+from mongo import MongoConnection
+
+# collection -> list of (keys, options)
+INDEXES = {
+    'users': [
+        ([('google_id', ASCENDING)], {'unique': True}),
+    ],
+    'files': [
+        # _id breaks upload_date ties in the keyset pagination of get_files
+        ([('user_id', ASCENDING), ('upload_date', DESCENDING), ('_id', DESCENDING)], {}),
+    ],
+    'flashcards': [
+        ([('file_id', ASCENDING), ('index', ASCENDING)], {'unique': True}),
+        ([('user_id', ASCENDING)], {}),
+    ],
+    'jobs': [
+        ([('status', ASCENDING)], {}),
+    ],
+}
+
+# collection -> keys of indexes replaced by one above, dropped by ensure_indexes
+SUPERSEDED = {
+    'files': [
+        [('user_id', ASCENDING), ('upload_date', DESCENDING)],
+    ],
+}
+
+# query shapes issued by the API routes, as (name, collection, filter, sort)
+ROUTE_QUERIES = [
+    ('google_login: find user', 'users', {'google_id': 'sample'}, None),
+    ('get_files: first page', 'files', {'user_id': 'sample'},
+     [('upload_date', DESCENDING), ('_id', DESCENDING)]),
+    ('get_files: next page', 'files',
+     {'user_id': 'sample', '$or': [
+         {'upload_date': {'$lt': datetime(2024, 1, 1)}},
+         {'upload_date': datetime(2024, 1, 1), '_id': {'$lt': ObjectId()}},
+     ]},
+     [('upload_date', DESCENDING), ('_id', DESCENDING)]),
+    ('get_flashcards: find file', 'files', {'_id': ObjectId(), 'user_id': 'sample'}, None),
+    ('get_flashcards: list cards', 'flashcards', {'file_id': ObjectId()}, [('index', ASCENDING)]),
+    ('delete_file: delete cards', 'flashcards', {'file_id': ObjectId()}, None),
+    ('get_job: find job', 'jobs', {'_id': ObjectId(), 'user_id': 'sample'}, None),
+    ('resume_pending: stale jobs', 'jobs', {'status': 'running', 'started_at': {'$lt': datetime(2024, 1, 1)}}, None),
+    ('resume_pending: queued jobs', 'jobs', {'status': 'queued'}, None),
+]
+
+def ensure_indexes(db) -> List[str]:
+    """
+    Create the indexes the API relies on and verify they exist.
+    Returns the index names, raises RuntimeError if one is missing.
+    """
+    names = []
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for info in list(collection.index_information().values()):
+            if list(info['key']) in SUPERSEDED.get(collection_name, []):
+                collection.drop_index(info['key'])
+
+        for keys, options in indexes:
+            names.append(collection.create_index(keys, **options))
+
+        # verify, create_index is a no-op when an index with the same keys exists
+        existing = [list(info['key']) for info in collection.index_information().values()]
+        for keys, _ in indexes:
+            if keys not in existing:
+                raise RuntimeError(f"Index {keys} missing on {collection_name}")
+
+    return names
+
+def _stages(plan):
+    """All stage names in an explain plan tree"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+def check_query_plans(db) -> List[Dict]:
+    """
+    Explain each route's query shape and report its winning plan stages.
+    A result with 'collscan': True means the query scans the collection.
+    """
+    results = []
+    for name, collection_name, query, sort in ROUTE_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+
+        try:
+            explain = cursor.explain()
+        except (NotImplementedError, AttributeError):
+            # mongomock has no query planner
+            results.append({'name': name, 'stages': [], 'collscan': False, 'skipped': True})
+            continue
+
+        stages = list(_stages(explain.get('queryPlanner', {}).get('winningPlan', {})))
+        results.append({'name': name, 'stages': stages, 'collscan': 'COLLSCAN' in stages, 'skipped': False})
+
+    return results
+
+# run: python db_indexes.py [ensure|explain]
+if __name__ == '__main__':
+    load_dotenv()
+    db = MongoConnection().connect().db
+    command = sys.argv[1] if len(sys.argv) > 1 else 'explain'
+
+    print(f"Ensured indexes: {', '.join(ensure_indexes(db))}")
+    if command == 'ensure':
+        sys.exit(0)
+
+    failed = False
+    for result in check_query_plans(db):
+        if result['skipped']:
+            status = 'SKIP'
+        elif result['collscan']:
+            status = 'FAIL'
+            failed = True
+        else:
+            status = 'OK'
+        print(f"[{status}] {result['name']}: {' > '.join(result['stages'])}")
+
+    sys.exit(1 if failed else 0)
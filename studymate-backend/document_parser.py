@@ -0,0 +1,246 @@
+import os
+import codecs
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ingest import CHUNK_SIZE
+
+# bump when extraction changes so cached text is not reused
+EXTRACTOR_VERSION = 'pages-1'
+
+# (page number, text), page is None for formats without pages
+Page = Tuple[Optional[int], str]
+
+# file extension -> function(path) yielding pages in order
+EXTRACTORS: Dict[str, Callable[[str], Iterator[Page]]] = {}
+
+# extracted text above this size is not cached, it would not fit a Mongo document
+MAX_CACHED_CHARS = 4 * 1024 * 1024
+
+def extractor(*extensions: str, cache_text: bool = True):
+    """Register a text extractor for file extensions"""
+    def register(fn):
+        fn.cache_text = cache_text
+        for extension in extensions:
+            EXTRACTORS[extension] = fn
+        return fn
+    return register
+
+def extension_of(filename: str) -> str:
+    return os.path.splitext(filename)[1].lower()
+
+def is_supported(filename: str) -> bool:
+    return extension_of(filename) in EXTRACTORS
+
+def extract_pages(path: str, filename: str, text_cache=None, content_hash: Optional[str] = None) -> Iterator[Page]:
+    """
+    Stream the text of a stored upload page by page. With a text cache
+    the pages of a previously extracted file are served from Mongo, and
+    a fresh extraction is cached once it completes
+    """
+    extract = EXTRACTORS.get(extension_of(filename))
+    if extract is None:
+        raise ValueError(f"No text extractor for {filename}")
+
+    use_cache = text_cache is not None and content_hash and extract.cache_text
+    if use_cache:
+        cached = text_cache.get(content_hash, EXTRACTOR_VERSION)
+        if cached is not None:
+            for page, text in cached:
+                yield page, text
+            return
+
+    pages: Optional[List[Page]] = [] if use_cache else None
+    size = 0
+    for page, text in extract(path):
+        if pages is not None:
+            size += len(text)
+            if size > MAX_CACHED_CHARS:
+                pages = None
+            else:
+                pages.append((page, text))
+        yield page, text
+
+    if pages is not None:
+        text_cache.put(content_hash, EXTRACTOR_VERSION, pages)
+
+# page-parallel extraction
+
+# the pool starts lazily from a request or job thread, a fork there would
+# copy locks other threads hold (Mongo pool, job queue, metrics), so like
+# the NLP pool it never forks the server process
+START_METHODS = ('forkserver', 'spawn')
+
+def _start_method() -> str:
+    method = os.getenv('EXTRACT_START_METHOD')
+    if not method:
+        method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+    if method not in START_METHODS:
+        raise ValueError(f"EXTRACT_START_METHOD must be one of {', '.join(START_METHODS)}")
+    return method
+
+class ExtractionPool:
+    """
+    Process pool that extracts page ranges of large documents in parallel.
+    Each task opens the file itself and extracts a few consecutive pages,
+    results come back in page order as they finish.
+    """
+
+    def __init__(self, workers: Optional[int] = None, pages_per_task: Optional[int] = None):
+        self.workers = workers or int(os.getenv('EXTRACT_WORKERS', '0')) or os.cpu_count() or 1
+        # opening a PDF has a fixed cost, so a task covers several pages
+        self.pages_per_task = pages_per_task or int(os.getenv('EXTRACT_PAGES_PER_TASK', '8'))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=mp.get_context(_start_method()))
+            return self._executor
+
+    def map_pages(self, extract_range: Callable[[str, int, int], List[Page]], path: str, page_count: int) -> Iterator[Page]:
+        """Yield the pages of a document, extract_range(path, start, end) runs in the pool"""
+        # small documents are not worth the round trip, and a single
+        # process reads the whole document with one open
+        if self.workers <= 1 or page_count <= self.pages_per_task:
+            yield from extract_range(path, 0, page_count)
+            return
+
+        # a few tasks per worker so a slow page range doesn't hold up the rest
+        step = max(self.pages_per_task, -(-page_count // (self.workers * 4)))
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+        executor = self._get_executor()
+        futures = [executor.submit(extract_range, path, start, end) for start, end in ranges]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # a consumer that stops early should not leave work queued
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ExtractionPool:
+    """Shared extraction pool, processes start on the first large document"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool()
+        return _pool
+
+# extractors
+
+@extractor('.txt', cache_text=False)
+def extract_text(path: str) -> Iterator[Page]:
+    """Plain text has no pages, decode it in chunks"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield None, decoder.decode(chunk)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield None, tail
+
+def _pdf_page_count(path: str) -> int:
+    try:
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    except ImportError:
+        from PyPDF2 import PdfReader
+        return len(PdfReader(path).pages)
+
+def _pdf_range(path: str, start: int, end: int) -> List[Page]:
+    """Text of pages [start, end) numbered from 1, runs in the extraction pool"""
+    try:
+        import pdfplumber
+    except ImportError:
+        pdfplumber = None
+
+    pages = []
+    if pdfplumber is not None:
+        numbers = list(range(start + 1, end + 1))
+        with pdfplumber.open(path, pages=numbers) as pdf:
+            for number, page in zip(numbers, pdf.pages):
+                pages.append((number, page.extract_text() or ''))
+                # parsed layout objects are kept per page otherwise
+                page.flush_cache()
+    else:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(path)
+        for index in range(start, end):
+            pages.append((index + 1, reader.pages[index].extract_text() or ''))
+    return pages
+
+@extractor('.pdf')
+def extract_pdf(path: str) -> Iterator[Page]:
+    """PDF text page by page, large documents are split across the pool"""
+    yield from get_pool().map_pages(_pdf_range, path, _pdf_page_count(path))
+
+@extractor('.docx')
+def extract_docx(path: str) -> Iterator[Page]:
+    """Paragraphs and tables in document order, pages follow the page breaks Word saved"""
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+    from docx.oxml.ns import qn
+
+    document = Document(path)
+    page = 1
+    for element in document.element.body.iterchildren():
+        if element.tag == qn('w:p'):
+            # word records where it broke pages when the file was last saved
+            rendered = len(element.findall('.//' + qn('w:lastRenderedPageBreak')))
+            explicit = len([br for br in element.iter(qn('w:br')) if br.get(qn('w:type')) == 'page'])
+            page += rendered or explicit
+            text = Paragraph(element, document).text
+        elif element.tag == qn('w:tbl'):
+            table = Table(element, document)
+            text = '\n\n'.join(cell.text for row in table.rows for cell in row.cells if cell.text.strip())
+        else:
+            continue
+
+        if text.strip():
+            # paragraphs end sentences, headings rarely have a full stop
+            yield page, text + '\n\n'
+
+def _shape_texts(shapes) -> Iterator[str]:
+    from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+    for shape in shapes:
+        if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+            yield from _shape_texts(shape.shapes)
+        elif shape.has_text_frame:
+            yield shape.text_frame.text
+        elif getattr(shape, 'has_table', False) and shape.has_table:
+            for row in shape.table.rows:
+                for cell in row.cells:
+                    yield cell.text
+
+@extractor('.pptx')
+def extract_pptx(path: str) -> Iterator[Page]:
+    """One page per slide, shape text followed by the speaker notes"""
+    from pptx import Presentation
+
+    for number, slide in enumerate(Presentation(path).slides, start=1):
+        texts = list(_shape_texts(slide.shapes))
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None:
+            texts.append(slide.notes_slide.notes_text_frame.text)
+        text = '\n\n'.join(t for t in texts if t.strip())
+        if text:
+            yield number, text
@@ -0,0 +1,165 @@
+import os
+import logging
+import time
+import threading
+import itertools
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import nlp_processor
+from shards import SHARD_CHARS, shard_pages
+from metrics import GENERATION_FALLBACKS, GENERATION_SECONDS
+
+log = logging.getLogger(__name__)
+
+# cheapest first
+TIERS = ('fast', 'standard', 'full')
+
+# tier tried next when one is at capacity, times out or fails
+FALLBACK = {'full': 'standard', 'standard': 'fast'}
+
+# seconds a pooled request may run past its budget before it is abandoned
+POOL_GRACE = 5.0
+
+class TieredGenerator:
+    """
+    Flashcard generation at a quality tier:
+      fast      regex patterns only (fast_fn)
+      standard  spaCy and the rule-based extractors
+      full      adds T5 question generation and semantic dedup
+
+    The NLP tiers have a latency budget and a cap on concurrent runs. A
+    tier at capacity is skipped for a cheaper one, and a run that times
+    out or fails is retried one tier down, so fast always answers.
+    With an NLPWorkerPool the NLP tiers run in its worker processes,
+    otherwise in the calling thread. A document longer than one shard
+    is split across the pool's workers, and their candidates are merged
+    into one selection.
+    """
+
+    def __init__(self, fast_fn: Callable[[Iterable[Tuple[Optional[int], str]]], List[Dict]], pool=None,
+                 max_cards: Optional[int] = None, budgets: Optional[Dict[str, float]] = None,
+                 max_active: Optional[Dict[str, int]] = None):
+        self.fast_fn = fast_fn
+        self.pool = pool
+        self.max_cards = max_cards or int(os.getenv('GEN_MAX_CARDS', '50'))
+        self.budgets = budgets or {
+            'standard': float(os.getenv('GEN_BUDGET_STANDARD', '30')),
+            'full': float(os.getenv('GEN_BUDGET_FULL', '120')),
+        }
+        self.max_active = max_active or {
+            'standard': int(os.getenv('GEN_MAX_ACTIVE_STANDARD', '4')),
+            'full': int(os.getenv('GEN_MAX_ACTIVE_FULL', '1')),
+        }
+
+        self._active = {'standard': 0, 'full': 0}
+        self._fallbacks = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, tier: str) -> str:
+        """Reserve a run at the tier, or the best cheaper one with capacity"""
+        with self._lock:
+            while tier != 'fast' and self._active[tier] >= self.max_active[tier]:
+                tier = FALLBACK[tier]
+            if tier != 'fast':
+                self._active[tier] += 1
+        return tier
+
+    def _release(self, tier: str):
+        with self._lock:
+            self._active[tier] -= 1
+
+    def generate(self, open_pages: Callable[[], Iterable[Tuple[Optional[int], str]]],
+                 tier: str) -> Tuple[List[Dict], str]:
+        """
+        Flashcards for the (page, sentence) pairs open_pages() streams, and
+        the tier that produced them. Each tier tried reads the document
+        again from a fresh open_pages(), it is never held in memory whole
+        """
+        if tier not in TIERS:
+            raise ValueError(f"Unknown generation tier {tier!r}")
+
+        used = self._acquire(tier)
+        while used != 'fast':
+            try:
+                with GENERATION_SECONDS.time(tier=used):
+                    cards = self._run_nlp(open_pages(), used)
+                if cards:
+                    break
+                log.info("No %s flashcards generated, trying a cheaper tier", used)
+            except Exception as e:
+                log.warning("%s generation failed (%s: %s), trying a cheaper tier", used, type(e).__name__, e)
+            finally:
+                self._release(used)
+            used = self._acquire(FALLBACK[used])
+        else:
+            with GENERATION_SECONDS.time(tier='fast'):
+                cards = self.fast_fn(open_pages())
+
+        if used != tier:
+            with self._lock:
+                self._fallbacks += 1
+            GENERATION_FALLBACKS.inc(requested=tier, used=used)
+            log.info("Generated %s flashcards instead of %s", used, tier)
+        return cards, used
+
+    def _run_nlp(self, pages: Iterable[Tuple[Optional[int], str]], tier: str) -> List[Dict]:
+        budget = self.budgets[tier]
+        if self.pool is not None:
+            return self._run_pool(pages, tier, budget)
+        return nlp_processor.generate_flashcards_from_pages(pages, self.max_cards, tier=tier, time_budget=budget)
+
+    def _run_pool(self, pages: Iterable[Tuple[Optional[int], str]], tier: str, budget: float) -> List[Dict]:
+        """
+        Generate on the pool. A document of several shards has its shards'
+        candidates extracted in parallel, at most one shard per worker in
+        flight, then one selection across all of them
+        """
+        # wall clock, the workers skip requests still queued past it
+        started_at = time.time()
+        expires_at = started_at + budget
+        shards = shard_pages(pages, SHARD_CHARS)
+        first = next(shards, [])
+        second = next(shards, None)
+        if second is None:
+            return self._wait(self.pool.submit_pages(first, self.max_cards, tier, expires_at=expires_at), expires_at)
+
+        inflight = deque()
+        candidates = []
+        count = 0
+        try:
+            for shard in itertools.chain([first, second], shards):
+                if len(inflight) >= self.pool.num_workers:
+                    candidates.extend(self._wait(inflight[0], expires_at))
+                    inflight.popleft()
+                inflight.append(self.pool.submit_candidates(shard, self.max_cards, tier, expires_at=expires_at,
+                                                              started_at=started_at))
+                count += 1
+            while inflight:
+                candidates.extend(self._wait(inflight[0], expires_at))
+                inflight.popleft()
+        finally:
+            # a failed or late shard fails the tier, the rest are withdrawn
+            for future in inflight:
+                self.pool.cancel(future)
+
+        log.debug("Generated %s candidates from %d shards", tier, count)
+        return self._wait(self.pool.submit_select(candidates, self.max_cards, tier), expires_at)
+
+    def _wait(self, future, expires_at: float) -> List[Dict]:
+        """Result of a pool request, withdrawn when it runs past expires_at"""
+        try:
+            return future.result(timeout=max(expires_at - time.time(), 0) + POOL_GRACE)
+        except FutureTimeout:
+            self.pool.cancel(future)
+            raise
+
+    def stats(self) -> Dict:
+        """Runs in progress per tier against their caps, and fallbacks so far"""
+        with self._lock:
+            return {
+                'active': dict(self._active),
+                'max_active': dict(self.max_active),
+                'fallbacks': self._fallbacks
+            }
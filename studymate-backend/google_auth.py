@@ -0,0 +1,113 @@
+import re
+import json
+import time
+import logging
+import hashlib
+import threading
+import requests
+from typing import Dict, Optional
+from google.auth import jwt
+
+log = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# used when the cert response has no max-age
+DEFAULT_CERTS_TTL = 3600
+
+# seconds between forced cert refetches, tokens with an unknown key id
+# must not be able to make every request fetch the certs again
+MIN_CERTS_REFETCH = 60.0
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google ID tokens against signing certs cached in memory until
+    their Cache-Control expiry, fetched over a pooled HTTP session. Certs
+    can be loaded from a local JSON file instead, for offline testing.
+    Recently verified tokens are remembered for a short TTL so quick
+    retries skip signature checks. An unknown key id refetches the certs
+    at most once per min_refetch_interval, tokens signed with a key still
+    unknown are rejected.
+    """
+
+    def __init__(self, client_id: str, certs_file: Optional[str] = None, token_cache_ttl: float = 60.0,
+                 token_cache_size: int = 10000, clock_skew: int = 10, timeout: float = 5.0,
+                 min_refetch_interval: float = MIN_CERTS_REFETCH):
+        self.client_id = client_id
+        self.certs_file = certs_file
+        self.token_cache_ttl = token_cache_ttl
+        self.token_cache_size = token_cache_size
+        self.clock_skew = clock_skew
+        self.timeout = timeout
+        self.min_refetch_interval = min_refetch_interval
+
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=10))
+
+        self._certs: Dict[str, str] = {}
+        self._certs_expiry = 0.0
+        self._certs_fetched_at = float('-inf')
+        self._certs_lock = threading.Lock()
+
+        # sha256(token) -> (expires_at, idinfo)
+        self._verified: Dict[str, tuple] = {}
+        self._verified_lock = threading.Lock()
+
+    def certs(self, force_refresh: bool = False) -> Dict[str, str]:
+        """Signing certs by key id, refreshed when expired or forced, at most once per min_refetch_interval"""
+        with self._certs_lock:
+            now = time.time()
+            if self._certs and not force_refresh and now < self._certs_expiry:
+                return self._certs
+            if self._certs and force_refresh and now - self._certs_fetched_at < self.min_refetch_interval:
+                return self._certs
+
+            if self.certs_file:
+                with open(self.certs_file) as f:
+                    self._certs = json.load(f)
+                self._certs_expiry = float('inf')
+            else:
+                response = self.session.get(GOOGLE_CERTS_URL, timeout=self.timeout)
+                response.raise_for_status()
+                self._certs = response.json()
+                self._certs_expiry = time.time() + _max_age(response.headers.get('Cache-Control', ''))
+                log.info("Fetched %d Google signing certs", len(self._certs))
+            self._certs_fetched_at = now
+
+            return self._certs
+
+    def verify(self, token: str) -> Dict:
+        """Verify an ID token and return its claims, raises ValueError if invalid"""
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        now = time.time()
+
+        with self._verified_lock:
+            cached = self._verified.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        certs = self.certs()
+        # a key id we don't know means Google rotated its keys, or a forged token
+        kid = jwt.decode_header(token).get('kid')
+        if kid not in certs:
+            certs = self.certs(force_refresh=True)
+            if kid not in certs:
+                raise ValueError(f"Unknown signing key: {kid}")
+
+        idinfo = jwt.decode(token, certs=certs, audience=self.client_id, clock_skew_in_seconds=self.clock_skew)
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+
+        expires_at = min(now + self.token_cache_ttl, idinfo.get('exp', now))
+        with self._verified_lock:
+            if len(self._verified) >= self.token_cache_size:
+                self._verified = {k: v for k, v in self._verified.items() if v[0] > now}
+            if len(self._verified) < self.token_cache_size:
+                self._verified[key] = (expires_at, idinfo)
+
+        return idinfo
+
+def _max_age(cache_control: str) -> int:
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else DEFAULT_CERTS_TTL
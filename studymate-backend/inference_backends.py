@@ -0,0 +1,117 @@
+import os
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+QG_MODEL_NAME = 'valhalla/t5-base-qg-hl'
+SENTENCE_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# torch: fp32 PyTorch as published
+# int8:  PyTorch with Linear layers dynamically quantized to int8
+# onnx:  graphs exported once with optimum and run on onnxruntime (needs optimum[onnxruntime])
+BACKENDS = ('torch', 'int8', 'onnx')
+
+# exported ONNX graphs are kept here so the export only happens once
+ONNX_CACHE_DIR = os.getenv('ONNX_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'studymate', 'onnx'))
+
+def check_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown NLP backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return backend
+
+def set_torch_threads(threads: Optional[int]):
+    """Intra-op threads for PyTorch, process wide"""
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+def _quantize(model):
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _ort_session_options(threads: Optional[int]):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    # one request runs at a time per session, parallelism comes from intra-op threads
+    options.inter_op_num_threads = 1
+    return options
+
+def onnx_path(name: str) -> str:
+    """Where the exported ONNX graphs of a model are cached"""
+    return os.path.join(ONNX_CACHE_DIR, name.replace('/', '--'))
+
+def _load_ort(model_class, name: str, threads: Optional[int]):
+    """An optimum ORT model, exported on first use and loaded from the cache after"""
+    path = onnx_path(name)
+    options = _ort_session_options(threads)
+    if os.path.isdir(path):
+        return model_class.from_pretrained(path, session_options=options)
+
+    log.info("Exporting %s to ONNX in %s", name, path)
+    model = model_class.from_pretrained(name, export=True, session_options=options)
+    model.save_pretrained(path)
+    return model
+
+def load_qg_pipeline(backend: str = 'torch', threads: Optional[int] = None):
+    """text2text-generation pipeline for the question generation model"""
+    from transformers import AutoTokenizer, pipeline
+
+    if backend == 'torch':
+        set_torch_threads(threads)
+        return pipeline('text2text-generation', model=QG_MODEL_NAME)
+
+    tokenizer = AutoTokenizer.from_pretrained(QG_MODEL_NAME)
+    if backend == 'int8':
+        from transformers import AutoModelForSeq2SeqLM
+        set_torch_threads(threads)
+        model = _quantize(AutoModelForSeq2SeqLM.from_pretrained(QG_MODEL_NAME).eval())
+    else:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        model = _load_ort(ORTModelForSeq2SeqLM, QG_MODEL_NAME, threads)
+    return pipeline('text2text-generation', model=model, tokenizer=tokenizer)
+
+class OnnxSentenceEncoder:
+    """
+    MiniLM on onnxruntime with the same encode() signature as
+    SentenceTransformer: mean pooling over tokens, optionally normalized
+    """
+
+    def __init__(self, threads: Optional[int] = None, max_length: int = 256):
+        from transformers import AutoTokenizer
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+        self.tokenizer = AutoTokenizer.from_pretrained(SENTENCE_MODEL_NAME)
+        self.model = _load_ort(ORTModelForFeatureExtraction, SENTENCE_MODEL_NAME, threads)
+        self.max_length = max_length
+
+    def encode(self, sentences: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False) -> np.ndarray:
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors='np')
+            hidden = np.asarray(self.model(**inputs).last_hidden_state)
+            mask = inputs['attention_mask'][..., None].astype(hidden.dtype)
+            batches.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 384), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+def load_sentence_encoder(backend: str = 'torch', threads: Optional[int] = None):
+    """Sentence embedding model with a SentenceTransformer style encode()"""
+    if backend == 'onnx':
+        return OnnxSentenceEncoder(threads)
+
+    from sentence_transformers import SentenceTransformer
+    set_torch_threads(threads)
+    model = SentenceTransformer(SENTENCE_MODEL_NAME, device='cpu')
+    if backend == 'int8':
+        model = _quantize(model.eval())
+    return model
@@ -0,0 +1,238 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from metrics import INFERENCE_BATCH_SIZE, INFERENCE_QUEUE_DEPTH, INFERENCE_WAIT_SECONDS
+
+log = logging.getLogger(__name__)
+
+# how long the first queued input waits for others to share its forward pass
+MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', '5'))
+
+# seconds a caller waits for its results before giving up
+TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', '120'))
+
+# model name -> scheduler, for stats()
+SCHEDULERS: Dict[str, 'MicroBatcher'] = {}
+
+class _Call:
+    """Inputs of one caller, resolved together once every input has a result"""
+
+    def __init__(self, count: int):
+        self.future = Future()
+        self.results: List[Any] = [None] * count
+        self.remaining = count
+
+class _Item:
+    def __init__(self, call: _Call, index: int, value, key: Hashable, enqueued: float):
+        self.call = call
+        self.index = index
+        self.value = value
+        self.key = key
+        self.enqueued = enqueued
+
+class MicroBatcher:
+    """
+    Dynamic batching of model inputs across threads. Callers queue their
+    inputs and get a future. A scheduler thread waits up to max_wait_ms
+    after the first input for others to arrive, or until max_batch inputs
+    are queued, and runs them through run_batch(inputs, key) in one
+    forward pass. Only inputs queued with the same key (the call options)
+    share a batch.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List[Any], Hashable], List[Any]], max_batch: int,
+                 max_wait_ms: Optional[float] = None, timeout: Optional[float] = None):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else MAX_WAIT_MS) / 1000
+        self.timeout = timeout or TIMEOUT
+
+        self.batches = 0
+        self.items = 0
+        self._closed = False
+        self._reset()
+        SCHEDULERS[name] = self
+
+    def _reset(self):
+        # a forked child gets the queue but not the thread serving it
+        self._pid = os.getpid()
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, inputs: List[Any], key: Hashable = ()) -> Future:
+        """Queue a caller's inputs, the future resolves to their results in order"""
+        if os.getpid() != self._pid:
+            self._reset()
+
+        call = _Call(len(inputs))
+        if not inputs:
+            call.future.set_result([])
+            return call.future
+
+        now = time.monotonic()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} scheduler is shut down")
+            self._queue.extend(_Item(call, i, value, key, now) for i, value in enumerate(inputs))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f'{self.name}-batcher', daemon=True)
+                self._thread.start()
+            depth = len(self._queue)
+            self._cond.notify()
+        INFERENCE_QUEUE_DEPTH.set(depth, model=self.name)
+        return call.future
+
+    def __call__(self, inputs: List[Any], key: Hashable = (), timeout: Optional[float] = None) -> List[Any]:
+        """Run inputs through the model in shared batches and wait for their results"""
+        future = self.submit(inputs, key)
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeout:
+            # inputs not yet in a batch are dropped
+            future.cancel()
+            raise TimeoutError(f"{self.name} inference did not finish within {timeout or self.timeout}s")
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+
+                # give concurrent callers a moment to add to the batch
+                first = self._queue[0].enqueued
+                while len(self._queue) < self.max_batch and not self._closed:
+                    remaining = first + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._take()
+                depth = len(self._queue)
+            INFERENCE_QUEUE_DEPTH.set(depth, model=self.name)
+            if batch:
+                self._run(batch)
+
+    def _take(self) -> List[_Item]:
+        """Up to max_batch queued inputs sharing the key of the oldest one, in queue order"""
+        batch: List[_Item] = []
+        rest = deque()
+        while self._queue:
+            item = self._queue.popleft()
+            call = item.call
+            if call.future.done():
+                # the caller timed out or another of its inputs failed
+                continue
+            if len(batch) >= self.max_batch or (batch and item.key != batch[0].key):
+                rest.append(item)
+                continue
+            # a running call can no longer be cancelled by its caller
+            if not call.future.running() and not call.future.set_running_or_notify_cancel():
+                continue
+            batch.append(item)
+        self._queue = rest
+        return batch
+
+    def _run(self, batch: List[_Item]):
+        started = time.monotonic()
+        for item in batch:
+            INFERENCE_WAIT_SECONDS.observe(started - item.enqueued, model=self.name)
+        INFERENCE_BATCH_SIZE.observe(len(batch), model=self.name)
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            results = self.run_batch([item.value for item in batch], batch[0].key)
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} inputs")
+        except Exception as e:
+            log.warning("%s batch of %d failed: %s", self.name, len(batch), e)
+            for item in batch:
+                if not item.call.future.done():
+                    item.call.future.set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            call = item.call
+            if call.future.done():
+                continue
+            call.results[item.index] = result
+            call.remaining -= 1
+            if call.remaining == 0:
+                call.future.set_result(call.results)
+
+    def stats(self) -> Dict:
+        """Inputs waiting now, and batches run so far"""
+        return {
+            'queued': len(self._queue),
+            'batches': self.batches,
+            'mean_batch': self.items / self.batches if self.batches else 0.0
+        }
+
+    def shutdown(self):
+        """Stop the scheduler thread once the queue is drained"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+class BatchedQuestionGenerator:
+    """
+    Drop-in for the text2text-generation pipeline that sends its inputs
+    through a MicroBatcher, so concurrent generations share forward passes
+    """
+
+    def __init__(self, pipe, max_batch: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.pipe = pipe
+        self.tokenizer = getattr(pipe, 'tokenizer', None)
+        self.batcher = MicroBatcher('qg_model', self._run_batch,
+                                    max_batch or int(os.getenv('INFERENCE_MAX_BATCH_QG', '16')), max_wait_ms)
+
+    def _run_batch(self, inputs: List[str], key) -> List[Any]:
+        return list(self.pipe(inputs, batch_size=len(inputs), **dict(key)))
+
+    def __call__(self, inputs, batch_size: Optional[int] = None, **kwargs):
+        # the batch size is the scheduler's, the other options must match to share a batch
+        single = isinstance(inputs, str)
+        results = self.batcher([inputs] if single else list(inputs), tuple(sorted(kwargs.items())))
+        return results[0] if single else results
+
+class BatchedSentenceEncoder:
+    """
+    Drop-in for a sentence encoder's encode() that sends its sentences
+    through a MicroBatcher, so concurrent dedups share forward passes
+    """
+
+    def __init__(self, model, max_batch: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.model = model
+        self.batcher = MicroBatcher('sentence_model', self._run_batch,
+                                    max_batch or int(os.getenv('INFERENCE_MAX_BATCH_ENCODE', '128')), max_wait_ms)
+
+    def _run_batch(self, sentences: List[str], key) -> List[np.ndarray]:
+        embeddings = self.model.encode(sentences, batch_size=len(sentences), convert_to_numpy=True,
+                                       show_progress_bar=False, **dict(key))
+        return list(embeddings)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False) -> np.ndarray:
+        single = isinstance(sentences, str)
+        vectors = self.batcher([sentences] if single else list(sentences),
+                               (('normalize_embeddings', normalize_embeddings),))
+        if single:
+            return vectors[0]
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+def stats() -> Dict[str, Dict]:
+    """Stats of every scheduler in this process"""
+    return {name: scheduler.stats() for name, scheduler in SCHEDULERS.items()}
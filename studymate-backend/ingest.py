@@ -0,0 +1,120 @@
+import re
+import codecs
+import hashlib
+from typing import Iterable, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+# sentence ends at terminal punctuation followed by whitespace, or a blank line
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+class StreamingIngest:
+    """
+    Single pass over an upload stream in bounded-size buffers: hashes and
+    sizes the raw bytes, optionally copies them to a sink, and decodes
+    UTF-8 incrementally into sentences. Memory stays at one read buffer
+    plus the unfinished sentence, however large the upload is.
+    """
+
+    def __init__(self, stream, sink=None, chunk_size: int = CHUNK_SIZE, max_sentence_chars: int = 5000):
+        self.stream = stream
+        self.sink = sink
+        self.chunk_size = chunk_size
+        # text without any boundary is cut here so a single run-on
+        # paragraph cannot grow the buffer without limit
+        self.max_sentence_chars = max_sentence_chars
+
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def sha256(self) -> str:
+        return self._sha.hexdigest()
+
+    def _chunks(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                break
+            self._sha.update(chunk)
+            self.size += len(chunk)
+            if self.sink is not None:
+                self.sink.write(chunk)
+            yield chunk
+
+    def drain(self):
+        """Consume the stream without decoding, for hashing and storing only"""
+        for _ in self._chunks():
+            pass
+        return self
+
+    def sentences(self) -> Iterator[str]:
+        """Yield sentences as the stream is read"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        pending = ''
+
+        for chunk in self._chunks():
+            pending += decoder.decode(chunk)
+            pending = yield from self._split(pending)
+
+        pending += decoder.decode(b'', final=True)
+        tail = pending.strip()
+        if tail:
+            yield tail
+
+    def _split(self, pending: str):
+        """Yield complete sentences from the buffer, return the unfinished rest"""
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(pending):
+            # a boundary at the very end may continue in the next chunk
+            if match.end() == len(pending):
+                break
+            sentence = pending[start:match.start()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+
+        rest = pending[start:]
+        while len(rest) > self.max_sentence_chars:
+            # cut overlong text at the last space inside the limit
+            cut = rest.rfind(' ', 0, self.max_sentence_chars)
+            if cut <= 0:
+                cut = self.max_sentence_chars
+            piece = rest[:cut].strip()
+            if piece:
+                yield piece
+            rest = rest[cut:]
+        return rest
+
+def iter_file_sentences(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Stream the sentences of a stored upload"""
+    with open(path, 'rb') as f:
+        yield from StreamingIngest(f, chunk_size=chunk_size).sentences()
+
+def iter_page_sentences(pages: Iterable[Tuple[Optional[int], str]],
+                        max_sentence_chars: int = 5000) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Sentences of extracted (page, text) pieces tagged with their page.
+    Pieces of the same page are joined, a sentence never spans two pages
+    """
+    splitter = StreamingIngest(None, max_sentence_chars=max_sentence_chars)
+    current, pending = None, ''
+
+    for page, text in pages:
+        if page != current:
+            tail = pending.strip()
+            if tail:
+                yield current, tail
+            current, pending = page, ''
+
+        split = splitter._split(pending + text)
+        while True:
+            try:
+                yield current, next(split)
+            except StopIteration as done:
+                pending = done.value
+                break
+
+    tail = pending.strip()
+    if tail:
+        yield current, tail
@@ -0,0 +1,154 @@
+import os
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+
+log = logging.getLogger(__name__)
+
+# job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+# the file was deleted before its cards were saved
+CANCELLED = 'cancelled'
+
+class JobQueue:
+    """
+    Runs flashcard generation in a local worker pool so uploads can
+    return immediately. Job records live in Mongo and the generated
+    cards are written to the file document when a job finishes.
+    """
+
+    def __init__(self, jobs_collection, card_store, generate_fn, workers: int = 2, stale_after: int = 900,
+                 sweep_interval: float = 60.0):
+        """
+        card_store is the FlashcardStore the finished cards are saved to,
+        generate_fn(job) returns the list of flashcards for a job record,
+        running jobs older than stale_after seconds are assumed abandoned,
+        every sweep_interval seconds queued jobs no process is running are picked up
+        """
+        self.jobs = jobs_collection
+        self.card_store = card_store
+        self.generate_fn = generate_fn
+        self.stale_after = stale_after
+        self.sweep_interval = sweep_interval
+        # several web workers share the jobs collection, each job is claimed by one
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='flashcard-job')
+
+        # ids submitted to this executor and not yet started, sweeps skip them
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sweeper = None
+
+    def submit(self, file_id, user_id: str, filepath: str, filename: str, **params) -> str:
+        """Create a job record and queue it, returns the job id"""
+        job_doc = {
+            'file_id': file_id,
+            'user_id': user_id,
+            'filepath': filepath,
+            'filename': filename,
+            'status': QUEUED,
+            'stage': 'queued',
+            'progress': 0,
+            'created_at': datetime.now()
+        }
+        # extra generation parameters, passed to generate_fn with the record
+        job_doc.update(params)
+        job_id = self.jobs.insert_one(job_doc).inserted_id
+        self._queue(job_id)
+        return str(job_id)
+
+    def get(self, job_id: str, user_id: str):
+        """Get a job record belonging to the user, None if not found"""
+        return self.jobs.find_one({'_id': ObjectId(job_id), 'user_id': user_id})
+
+    def resume_pending(self):
+        """
+        Re-queue jobs left unfinished by other processes, now and then every
+        sweep_interval seconds, so jobs a stopped process gave back are not stuck
+        """
+        self._sweep()
+        if self.sweep_interval and self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='flashcard-job-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """Stop the pool, cancelled jobs stay queued in Mongo for the next sweep of another process"""
+        self._stopped.set()
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+    def _queue(self, job_id):
+        with self._queued_lock:
+            self._queued.add(job_id)
+        self.executor.submit(self._run, job_id)
+
+    def _sweep(self) -> int:
+        """Queue jobs nobody is running here, returns how many"""
+        # running jobs whose process died never finish, make them claimable again
+        stale = datetime.now() - timedelta(seconds=self.stale_after)
+        self.jobs.update_many(
+            {'status': RUNNING, 'started_at': {'$lt': stale}},
+            {'$set': {'status': QUEUED, 'stage': 'queued'}}
+        )
+
+        with self._queued_lock:
+            queued_here = set(self._queued)
+        pending = [job['_id'] for job in self.jobs.find({'status': QUEUED}, {'_id': 1})
+                   if job['_id'] not in queued_here]
+        for job_id in pending:
+            self._queue(job_id)
+        if pending:
+            log.info("Resumed %d flashcard jobs", len(pending))
+        return len(pending)
+
+    def _sweep_loop(self):
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self._sweep()
+            except RuntimeError:
+                # the executor shut down between the check and the submit
+                return
+            except Exception as e:
+                log.warning("Job sweep failed: %s", e)
+
+    def _update(self, job_id, **fields):
+        self.jobs.update_one({'_id': job_id}, {'$set': fields})
+
+    def _run(self, job_id):
+        with self._queued_lock:
+            self._queued.discard(job_id)
+
+        # claim the job, another process may have queued it too
+        job = self.jobs.find_one_and_update(
+            {'_id': job_id, 'status': QUEUED},
+            {'$set': {'status': RUNNING, 'stage': 'generating', 'progress': 10,
+                      'owner': self.owner, 'started_at': datetime.now()}}
+        )
+        if not job:
+            return
+
+        try:
+            flashcards = self.generate_fn(job)
+
+            self._update(job_id, stage='saving', progress=90)
+            if not self.card_store.save(job['file_id'], job['user_id'], flashcards):
+                self._update(job_id, status=CANCELLED, stage='cancelled', finished_at=datetime.now())
+                log.info("Job %s discarded its flashcards, %s was deleted", job_id, job['filename'],
+                         extra={'job_id': str(job_id)})
+                return
+
+            self._update(job_id, status=DONE, stage='done', progress=100,
+                         flashcard_count=len(flashcards), finished_at=datetime.now())
+            log.info("Job %s generated %d flashcards for %s", job_id, len(flashcards), job['filename'],
+                     extra={'job_id': str(job_id), 'flashcards': len(flashcards)})
+
+        except Exception as e:
+            log.exception("Job %s failed: %s", job_id, e, extra={'job_id': str(job_id)})
+            self.card_store.mark_failed(job['file_id'])
+            self._update(job_id, status=FAILED, stage='failed', error=str(e), finished_at=datetime.now())
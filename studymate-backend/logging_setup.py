@@ -0,0 +1,40 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+# attributes every LogRecord has, anything else was passed with extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# libraries that log every object they parse at debug level
+NOISY_LOGGERS = ('pdfminer', 'pdfplumber', 'PIL', 'urllib3', 'filelock', 'h5py', 'matplotlib')
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the extra= fields as keys, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level: str = 'INFO', fmt: str = 'text'):
+    """Send all logs to stderr as text or JSON lines, replaces existing handlers"""
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
@@ -0,0 +1,200 @@
+import sys
+import time
+import bisect
+import threading
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# seconds, from sub-millisecond Mongo commands to minutes of T5 generation
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels_text(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_value(key, value) for key, value in items)
+        return lines
+
+    def _render_value(self, key: Tuple, value) -> str:
+        return f'{self.name}{_labels_text(self.label_names, key)} {value}'
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests or failures"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """Value that is set, e.g. how long a model took to load"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_labels_text(self.label_names, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels_text(self.label_names, key)} {total}')
+            lines.append(f'{self.name}_count{_labels_text(self.label_names, key)} {cumulative}')
+        return lines
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labels, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# process-wide registry, each gunicorn worker reports its own
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# metrics shared across modules
+REQUEST_SECONDS = REGISTRY.histogram(
+    'studymate_http_request_seconds', 'HTTP request latency by route', ('method', 'route', 'status'))
+STAGE_SECONDS = REGISTRY.histogram(
+    'studymate_generation_stage_seconds', 'Time spent in each flashcard generation stage', ('stage',))
+GENERATION_SECONDS = REGISTRY.histogram(
+    'studymate_generation_seconds', 'Flashcard generation time per job by tier', ('tier',))
+GENERATION_FALLBACKS = REGISTRY.counter(
+    'studymate_generation_fallbacks_total', 'Generations answered by a cheaper tier than requested', ('requested', 'used'))
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    'studymate_model_load_seconds', 'Time taken to load each NLP component', ('component',))
+MONGO_COMMAND_SECONDS = REGISTRY.histogram(
+    'studymate_mongo_command_seconds', 'MongoDB command latency', ('command', 'status'))
+INFERENCE_QUEUE_DEPTH = REGISTRY.gauge(
+    'studymate_inference_queue_depth', 'Model inputs waiting for a batched forward pass', ('model',))
+INFERENCE_BATCH_SIZE = REGISTRY.histogram(
+    'studymate_inference_batch_size', 'Inputs per batched forward pass', ('model',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+INFERENCE_WAIT_SECONDS = REGISTRY.histogram(
+    'studymate_inference_wait_seconds', 'Time a model input waited to join a batch', ('model',))
+
+def stage(name: str):
+    """Time a flashcard generation stage"""
+    return STAGE_SECONDS.time(stage=name)
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval from a background
+    thread, and reports the sampled stacks in collapsed (flamegraph) format.
+    Cheap enough to switch on for a single request.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = StackCounter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """One 'frame;frame;frame count' line per distinct stack, most sampled first"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common()) + '\n'
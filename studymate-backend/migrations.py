@@ -0,0 +1,37 @@
+from dotenv import load_dotenv
+from mongo import MongoConnection
+from cards import FlashcardStore
+
+def migrate_embedded_flashcards(db, batch_size: int = 100) -> int:
+    """
+    Move flashcards embedded in file documents into the flashcards
+    collection and set flashcard_count. Safe to run more than once.
+    Returns the number of migrated files.
+    """
+    files_collection = db['files']
+    store = FlashcardStore(db['flashcards'], files_collection)
+
+    migrated = 0
+    cursor = files_collection.find(
+        {'flashcards': {'$exists': True}},
+        {'user_id': 1, 'flashcards': 1, 'status': 1},
+        batch_size=batch_size
+    )
+    for file_doc in cursor:
+        flashcards = file_doc.get('flashcards') or []
+        store.save(file_doc['_id'], file_doc['user_id'], flashcards)
+
+        update = {'$unset': {'flashcards': ''}}
+        # the store marks the file ready, keep jobs that are still running visible
+        if file_doc.get('status') and file_doc['status'] != 'ready':
+            update['$set'] = {'status': file_doc['status']}
+        files_collection.update_one({'_id': file_doc['_id']}, update)
+        migrated += 1
+
+    return migrated
+
+# run: python migrations.py
+if __name__ == '__main__':
+    load_dotenv()
+    count = migrate_embedded_flashcards(MongoConnection().connect().db)
+    print(f"Migrated flashcards of {count} files")
@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+from pymongo import MongoClient, monitoring
+from pymongo.write_concern import WriteConcern
+from metrics import MONGO_COMMAND_SECONDS
+
+log = logging.getLogger(__name__)
+
+# write concern per kind of operation
+WRITE_CONCERNS = {
+    # progress updates and caches, losing one on failover is harmless
+    'relaxed': WriteConcern(w=1, j=False),
+    'default': WriteConcern(w=1),
+    # user accounts and uploads must survive a primary failover
+    'durable': WriteConcern(w='majority', j=True, wtimeout=5000),
+}
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counts connections open, in use, waiting and failed checkouts per server"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, Dict[str, int]] = {}
+
+    def _bump(self, address, **changes):
+        key = f"{address[0]}:{address[1]}"
+        with self._lock:
+            server = self._servers.setdefault(key, {
+                'open': 0, 'in_use': 0, 'waiting': 0, 'checkouts': 0, 'checkout_failures': 0
+            })
+            for field, change in changes.items():
+                server[field] += change
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {address: dict(counts) for address, counts in self._servers.items()}
+
+    def pool_created(self, event):
+        self._bump(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._bump(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._bump(event.address, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._bump(event.address, waiting=-1, in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._bump(event.address, in_use=-1)
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command sent to the server"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, status='ok')
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, status='error')
+
+class MongoConnection:
+    """
+    Owns the MongoClient: pool sizes and timeouts come from MONGO_* env
+    vars, startup retries with exponential backoff (or fails fast), and
+    collections are handed out with a named write concern profile.
+    """
+
+    def __init__(self, uri: Optional[str] = None, db_name: Optional[str] = None):
+        self.uri = uri or os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+        self.db_name = db_name or os.getenv('MONGODB_DB', 'studymate')
+
+        self.options = {
+            'maxPoolSize': _env_int('MONGO_MAX_POOL_SIZE', 50),
+            'minPoolSize': _env_int('MONGO_MIN_POOL_SIZE', 2),
+            'maxIdleTimeMS': _env_int('MONGO_MAX_IDLE_MS', 60000),
+            'waitQueueTimeoutMS': _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000),
+            'serverSelectionTimeoutMS': _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+            'connectTimeoutMS': _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+            'socketTimeoutMS': _env_int('MONGO_SOCKET_TIMEOUT_MS', 30000),
+            'retryWrites': True,
+            'retryReads': True,
+        }
+        self.startup_retries = _env_int('MONGO_STARTUP_RETRIES', 5)
+        self.retry_backoff = float(os.getenv('MONGO_RETRY_BACKOFF', '0.5'))
+        self.fail_fast = os.getenv('MONGO_FAIL_FAST', '').lower() in ('1', 'true', 'yes')
+
+        self.pool_metrics = PoolMetrics()
+        self.command_metrics = CommandMetrics()
+        self.client = None
+        self.db = None
+
+    def connect(self):
+        """Connect and ping, retrying with backoff. Raises if the server stays unreachable"""
+        attempts = 1 if self.fail_fast else self.startup_retries + 1
+
+        for attempt in range(attempts):
+            client = MongoClient(self.uri, event_listeners=[self.pool_metrics, self.command_metrics], **self.options)
+            try:
+                client.admin.command('ping')
+                self.client = client
+                self.db = client[self.db_name]
+                return self
+            except Exception as e:
+                client.close()
+                if attempt == attempts - 1:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                log.warning("MongoDB not reachable (%s), retrying in %.1fs", e, delay)
+                time.sleep(delay)
+
+    def collection(self, name: str, profile: str = 'default'):
+        """A collection using one of the WRITE_CONCERNS profiles"""
+        return self.db[name].with_options(write_concern=WRITE_CONCERNS[profile])
+
+    def pool_stats(self) -> Dict:
+        """Pool utilization per server plus the configured limits"""
+        return {
+            'max_pool_size': self.options['maxPoolSize'],
+            'min_pool_size': self.options['minPoolSize'],
+            'servers': self.pool_metrics.snapshot()
+        }
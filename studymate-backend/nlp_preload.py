@@ -0,0 +1,17 @@
+"""
+Imported by the fork server NLP workers are started from. Loads the
+models once there, so every worker forked from it shares their memory
+copy-on-write instead of loading its own copy.
+"""
+import nlp_processor
+
+# the fork server must stay single threaded for its forks to be safe, so
+# loading must not start torch's intra-op thread pool. Workers set their
+# own thread count
+try:
+    import torch
+    torch.set_num_threads(1)
+except ImportError:
+    pass
+
+nlp_processor.warmup()
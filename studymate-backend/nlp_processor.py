@@ -1,120 +1,538 @@
-import spacy
-import nltk
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
+import os
 import re
-from typing import List, Dict
+import time
+import logging
+import threading
+import multiprocessing as mp
+import numpy as np
+from bisect import bisect_left, bisect_right
+from typing import Any, List, Dict, Iterable, Iterator, Optional, Tuple
 import warnings
+from metrics import MODEL_LOAD_SECONDS, stage
+import inference_backends
+import inference_scheduler
+from shards import SHARD_CHARS, shard_pages, split_text
 warnings.filterwarnings('ignore')
 
+log = logging.getLogger(__name__)
+
+# definition phrasing, matched at the start of a clause. The term is bounded
+# and cannot cross punctuation, the definition runs to the next punctuation
+# mark or CLAUSE_BREAK, so each attempt is linear in the clause length and
+# the attempts of a sentence together in its length
+DEFINITION_PATTERN = re.compile(
+    r'(?:the term\s+)?'
+    r'(?P<term>[^\s.,;:][^.,;:]{3,98}?)\s+'
+    r'(?:is|are|refers to|means|can be defined as)\s+'
+    r'(?:(?:a|an|the)\s+)?'
+    r'(?P<definition>[^.,;:]{11,})',
+    re.IGNORECASE
+)
+
+# positions where a new clause can start inside a sentence
+CLAUSE_BREAK = re.compile(r'[,;:]\s*')
+
+# spaCy components each tier's extractors read from: sentences (senter)
+# and entities (ner) in every tier, full also highlights the first noun
+# chunk of each T5 chunk, which needs tags and the dependency parse
+SPACY_COMPONENTS = {
+    'standard': ('senter', 'ner'),
+    'full': ('tagger', 'attribute_ruler', 'parser', 'ner'),
+}
+
+# components of en_core_web_sm no extractor reads, never loaded
+SPACY_EXCLUDE = ('lemmatizer',)
+
+class GenerationTimeout(TimeoutError):
+    """Generation ran past its time budget"""
+
+def _check_deadline(deadline: Optional[float]):
+    if deadline is not None and time.monotonic() > deadline:
+        raise GenerationTimeout("flashcard generation exceeded its time budget")
+
+class ParsedDocument:
+    """
+    Parse of a text built once and shared by every extractor:
+    spaCy Doc, sentences with character offsets, tokens, noun chunks
+    and an index from entity text to the sentences that contain it
+    """
+
+    def __init__(self, text: str, nlp=None, doc=None):
+        self.text = text
+        self.doc = doc if doc is not None else (nlp(text) if nlp else None)
+
+        # sentences[i] starts at sentence_starts[i] and ends at sentence_ends[i]
+        self.sentences: List[str] = []
+        self.sentence_starts: List[int] = []
+        self.sentence_ends: List[int] = []
+        self.sentence_tokens: List[List[str]] = []
+
+        # noun chunks as (start_char, end_char, text), ordered by start
+        self.noun_chunks: List[Tuple[int, int, str]] = []
+
+        # entity/term text -> indices of sentences containing it
+        self.term_sentences: Dict[str, List[int]] = {}
+
+        if self.doc is not None:
+            self._load_from_doc()
+        else:
+            self._load_from_nltk()
+
+    def _load_from_doc(self):
+        for sent in self.doc.sents:
+            sent_text = sent.text.strip()
+            if not sent_text:
+                continue
+            self.sentences.append(sent_text)
+            self.sentence_starts.append(sent.start_char)
+            self.sentence_ends.append(sent.end_char)
+            self.sentence_tokens.append([t.text for t in sent if not t.is_space])
+
+        try:
+            self.noun_chunks = [(c.start_char, c.end_char, c.text) for c in self.doc.noun_chunks]
+        except (ValueError, NotImplementedError):
+            # pipeline without a parser has no noun chunks
+            self.noun_chunks = []
+
+        # index entity spans by the sentence they start in
+        for ent in self.doc.ents:
+            sent_index = self.sentence_index_at(ent.start_char)
+            if sent_index < 0:
+                continue
+            indices = self.term_sentences.setdefault(ent.text, [])
+            if not indices or indices[-1] != sent_index:
+                indices.append(sent_index)
+
+    def _load_from_nltk(self):
+        try:
+            import nltk
+            tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+            spans = list(tokenizer.span_tokenize(self.text))
+            word_tokenize = nltk.word_tokenize
+        except (ImportError, LookupError):
+            spans = [(m.start(), m.end()) for m in re.finditer(r'[^.!?]+[.!?]*', self.text)]
+            word_tokenize = str.split
+
+        for start, end in spans:
+            sent_text = self.text[start:end].strip()
+            if not sent_text:
+                continue
+            self.sentences.append(sent_text)
+            self.sentence_starts.append(start)
+            self.sentence_ends.append(end)
+            try:
+                self.sentence_tokens.append(word_tokenize(sent_text))
+            except LookupError:
+                self.sentence_tokens.append(sent_text.split())
+
+    def sentence_index_at(self, char_offset: int) -> int:
+        """Index of the sentence containing the offset, -1 if none"""
+        i = bisect_right(self.sentence_starts, char_offset) - 1
+        if i >= 0 and char_offset < self.sentence_ends[i]:
+            return i
+        return -1
+
+    def sentences_with(self, term: str) -> List[int]:
+        """Indices of sentences containing a term, indexed on first lookup"""
+        indices = self.term_sentences.get(term)
+        if indices is None:
+            indices = [i for i, sentence in enumerate(self.sentences) if term in sentence]
+            self.term_sentences[term] = indices
+        return indices
+
+    def first_noun_chunk(self, start: int, end: int) -> Optional[str]:
+        """First noun chunk that lies within [start, end)"""
+        i = bisect_left(self.noun_chunks, (start,))
+        if i < len(self.noun_chunks) and self.noun_chunks[i][1] <= end:
+            return self.noun_chunks[i][2]
+        return None
+
+# NLTK data used at runtime, as (resource path, download name)
+NLTK_RESOURCES = [
+    ('tokenizers/punkt', 'punkt'),
+    ('corpora/stopwords', 'stopwords'),
+]
+
 class FlashcardGenerator:
-    def __init__(self):
-        """Initialize NLP models"""
-        print("Initializing NLP models...")
-        
+    # components loaded on first use, see warmup()
+    COMPONENTS = ('nlp', 'stopwords', 'qg_model', 'sentence_model')
+
+    def __init__(self, qg_batch_size: int = 8, qg_max_tokens: int = 512, qg_time_budget: float = 30.0,
+                 dedup_threshold: float = 0.9, dedup_exact_limit: int = 2000, offline: Optional[bool] = None,
+                 backend: Optional[str] = None, threads: Optional[int] = None,
+                 pipe_batch_size: Optional[int] = None, pipe_processes: Optional[int] = None,
+                 shard_chars: Optional[int] = None, batching: Optional[bool] = None):
+        """
+        Configure the generator, models are loaded on first use
+
+        qg_batch_size: chunks sent to the question generation model per forward pass
+        qg_max_tokens: token budget for each chunk, capped by the model's own limit
+        qg_time_budget: seconds of question generation allowed per upload
+        dedup_threshold: cosine similarity above which two cards are near-duplicates
+        dedup_exact_limit: candidate count above which dedup uses an approximate index
+        offline: never download NLTK data or models (default: NLP_OFFLINE env var)
+        backend: torch, int8 or onnx inference for the T5 and MiniLM models (default: NLP_BACKEND or torch)
+        threads: intra-op threads for model inference (default: NLP_THREADS, or the library default)
+        pipe_batch_size: texts spaCy parses per batch in nlp.pipe (default: NLP_PIPE_BATCH_SIZE or 4)
+        pipe_processes: processes nlp.pipe parses with (default: NLP_PIPE_PROCESSES or 1)
+        shard_chars: longest text parsed at once, longer documents are sharded (default: NLP_SHARD_CHARS or 100000)
+        batching: batch T5 and MiniLM inputs across concurrent generations (default: NLP_BATCHING env var)
+        """
+        self.qg_batch_size = qg_batch_size
+        self.qg_max_tokens = qg_max_tokens
+        self.qg_time_budget = qg_time_budget
+        self.dedup_threshold = dedup_threshold
+        self.dedup_exact_limit = dedup_exact_limit
+        self.backend = inference_backends.check_backend(backend or os.getenv('NLP_BACKEND', 'torch'))
+        self.threads = threads or int(os.getenv('NLP_THREADS', '0')) or None
+        self.shard_chars = shard_chars or SHARD_CHARS
+        if batching is None:
+            batching = os.getenv('NLP_BATCHING', '').lower() in ('1', 'true', 'yes')
+        self.batching = batching
+        # a text is a shard of up to 100k characters, so batches stay small
+        self.pipe_batch_size = pipe_batch_size or int(os.getenv('NLP_PIPE_BATCH_SIZE', '4'))
+        self.pipe_processes = pipe_processes or int(os.getenv('NLP_PIPE_PROCESSES', '1'))
+        
+        if offline is None:
+            offline = os.getenv('NLP_OFFLINE', '').lower() in ('1', 'true', 'yes')
+        self.offline = offline
+        if offline:
+            # models must already be in the local Hugging Face cache
+            os.environ.setdefault('HF_HUB_OFFLINE', '1')
+            os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+        
+        self._components = {}
+        self._load_lock = threading.Lock()
+        # tier -> spaCy components switched off when parsing for it
+        self._pipe_disable = {}
+    
+    def _component(self, name: str):
+        """Load a component on first use, a failed load is cached as None"""
+        if name not in self._components:
+            with self._load_lock:
+                if name not in self._components:
+                    started = time.perf_counter()
+                    self._components[name] = getattr(self, f'_load_{name}')()
+                    MODEL_LOAD_SECONDS.set(time.perf_counter() - started, component=name)
+        return self._components[name]
+    
+    @property
+    def nlp(self):
+        return self._component('nlp')
+    
+    @property
+    def stopwords(self):
+        return self._component('stopwords')
+    
+    @property
+    def qg_model(self):
+        return self._component('qg_model')
+    
+    @property
+    def sentence_model(self):
+        return self._component('sentence_model')
+    
+    def warmup(self, components: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """
+        Load components ahead of traffic (default: all of them).
+        Returns which components are available
+        """
+        log.info("Initializing NLP models...")
+        status = {name: bool(self._component(name)) for name in (components or self.COMPONENTS)}
+        log.info("NLP initialization complete", extra={'components': status})
+        return status
+    
+    def _load_nlp(self):
         try:
             # load spacy model for NER and dependency parsing
-            self.nlp = spacy.load("en_core_web_sm")
-            print("✓ SpaCy model loaded")
-        except:
-            print("⚠ SpaCy model not found. Run: python -m spacy download en_core_web_sm")
-            self.nlp = None
-        
+            import spacy
+            nlp = spacy.load("en_core_web_sm", exclude=list(SPACY_EXCLUDE))
+            # the statistical sentence splitter ships disabled, it is much
+            # cheaper than the parser when only sentences are needed
+            if 'senter' in nlp.disabled:
+                nlp.enable_pipe('senter')
+            log.info("SpaCy model loaded", extra={'components': nlp.pipe_names})
+            return nlp
+        except Exception:
+            log.warning("SpaCy model not found. Run: python -m spacy download en_core_web_sm")
+            return None
+    
+    def _load_stopwords(self):
         try:
-            # download NLTK data
-            nltk.download('punkt', quiet=True)
-            nltk.download('stopwords', quiet=True)
-            nltk.download('averaged_perceptron_tagger', quiet=True)
+            import nltk
+            for resource, package in NLTK_RESOURCES:
+                try:
+                    nltk.data.find(resource)
+                except LookupError:
+                    if self.offline:
+                        raise
+                    # download NLTK data only when missing
+                    nltk.download(package, quiet=True)
             from nltk.corpus import stopwords
-            self.stopwords = set(stopwords.words('english'))
-            print("✓ NLTK initialized")
-        except:
-            print("⚠ NLTK initialization failed")
-            self.stopwords = set()
-        
+            words = set(stopwords.words('english'))
+            log.info("NLTK initialized")
+            return words
+        except Exception:
+            log.warning("NLTK initialization failed" + (" (offline, run setup-nlp.py)" if self.offline else ""))
+            return set()
+    
+    def _load_qg_model(self):
         try:
             # question generation model
-            self.qg_model = pipeline("text2text-generation", model="valhalla/t5-base-qg-hl")
-            print("✓ Question generation model loaded")
+            qg_model = inference_backends.load_qg_pipeline(self.backend, self.threads)
+            log.info("Question generation model loaded (%s)", self.backend)
+            if self.batching:
+                return inference_scheduler.BatchedQuestionGenerator(qg_model)
+            return qg_model
         except Exception as e:
-            print(f"⚠ Question generation model failed: {e}")
-            self.qg_model = None
-        
+            log.warning("Question generation model failed: %s", e)
+            return None
+    
+    def _load_sentence_model(self):
         try:
             # sentence transformer for semantic similarity
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-            print("✓ Sentence transformer loaded")
-        except:
-            print("⚠ Sentence transformer failed")
-            self.sentence_model = None
-        
-        print("NLP initialization complete!")
+            sentence_model = inference_backends.load_sentence_encoder(self.backend, self.threads)
+            log.info("Sentence transformer loaded (%s)", self.backend)
+            if self.batching:
+                return inference_scheduler.BatchedSentenceEncoder(sentence_model)
+            return sentence_model
+        except Exception as e:
+            log.warning("Sentence transformer failed: %s", e)
+            return None
     
-    def generate_flashcards(self, text: str, max_cards: int = 15) -> List[Dict]:
+    def generate_flashcards(self, text: str, max_cards: int = 15, tier: str = 'full',
+                            deadline: Optional[float] = None) -> List[Dict]:
         """
         Generate flashcards using multiple NLP techniques
         """
-        print(f"Generating flashcards from {len(text)} characters of text...")
+        log.debug("Generating flashcards from %d characters of text", len(text))
+        
+        shard_chars = self._shard_chars()
+        if len(text) > shard_chars:
+            # too long to parse at once, process it shard by shard
+            shards = ((None, shard) for shard in split_text(text, shard_chars))
+            return self.generate_flashcards_from_pages(shards, max_cards, tier=tier, deadline=deadline)
+        
+        # parse once, every extractor reads from the shared document
+        with stage('parse'):
+            parsed = self.parse(text, tier)
+        all_cards = self._extract_cards(parsed, tier, deadline)
+        
+        return self._select_cards(all_cards, max_cards, tier)
+    
+    def generate_flashcards_from_sentences(self, sentences: Iterable[str], max_cards: int = 15,
+                                           shard_chars: Optional[int] = None, tier: str = 'full',
+                                           deadline: Optional[float] = None) -> List[Dict]:
+        """
+        Generate flashcards from a stream of sentences, parsing one
+        bounded shard of sentences at a time
+        """
+        return self.generate_flashcards_from_pages(((None, sentence) for sentence in sentences),
+                                                   max_cards, shard_chars, tier, deadline)
+    
+    def generate_flashcards_from_pages(self, page_sentences: Iterable[Tuple[Optional[int], str]],
+                                       max_cards: int = 15, shard_chars: Optional[int] = None, tier: str = 'full',
+                                       deadline: Optional[float] = None) -> List[Dict]:
+        """
+        Same as generate_flashcards_from_sentences over (page, sentence)
+        pairs, each card gets the page its answer was found on.
+        Raises GenerationTimeout once the deadline (time.monotonic()) passes
+        """
+        all_cards = self.extract_candidates(page_sentences, max_cards, shard_chars, tier, deadline)
+        return self._select_cards(all_cards, max_cards, tier)
+    
+    def extract_candidates(self, page_sentences: Iterable[Tuple[Optional[int], str]], max_cards: int = 15,
+                           shard_chars: Optional[int] = None, tier: str = 'full',
+                           deadline: Optional[float] = None, qg_deadline: Optional[float] = None) -> List[Dict]:
+        """
+        Candidate cards of (page, sentence) pairs before the final selection,
+        at most max_cards * 4 of them. Candidates of separate parts of a
+        document can be merged with _select_cards. qg_deadline ends question
+        generation, by default qg_time_budget from now for the whole document
+        """
+        all_cards = []
+        # one question generation budget for the document, not one per shard
+        if qg_deadline is None:
+            qg_deadline = time.monotonic() + self.qg_time_budget
+        shards = (
+            (' '.join(sentence for _, sentence in shard), shard)
+            for shard in shard_pages(page_sentences, shard_chars or self._shard_chars())
+        )
+        # shards are parsed in nlp.pipe batches as the loop asks for them,
+        # so memory holds one batch of shards however long the document is
+        parsed_shards = self.parse_many(shards, tier)
+        
+        while True:
+            with stage('parse'):
+                item = next(parsed_shards, None)
+            if item is None:
+                break
+            parsed, shard = item
+            all_cards.extend(self._shard_cards(parsed, shard, tier, deadline, qg_deadline))
+            
+            # keep the candidate list bounded between shards
+            if len(all_cards) > max_cards * 4:
+                with stage('dedup'):
+                    all_cards = self._deduplicate_cards(all_cards, tier == 'full')
+                with stage('rank'):
+                    all_cards = self._rank_cards(all_cards)[:max_cards * 4]
+        
+        return all_cards
+    
+    def _shard_chars(self) -> int:
+        # a shard must also fit the spaCy model's own limit
+        if self.nlp:
+            return min(self.shard_chars, self.nlp.max_length)
+        return self.shard_chars
+    
+    def _shard_cards(self, parsed: ParsedDocument, shard: List[Tuple[Optional[int], str]],
+                     tier: str, deadline: Optional[float], qg_deadline: Optional[float] = None) -> List[Dict]:
+        """Cards of one shard of sentences, tagged with the page of their answer"""
+        cards = self._extract_cards(parsed, tier, deadline, qg_deadline)
+        
+        if any(page is not None for page, _ in shard):
+            sentences = [sentence for _, sentence in shard]
+            starts = []
+            offset = 0
+            for sentence in sentences:
+                starts.append(offset)
+                offset += len(sentence) + 1
+            for card in cards:
+                found = self._locate_answer(parsed.text, sentences, starts, card)
+                if found is not None:
+                    card['page'] = shard[found][0]
         
+        return cards
+    
+    def _locate_answer(self, text: str, sentences: List[str], starts: List[int], card: Dict) -> Optional[int]:
+        """
+        Index of the sentence a card's answer came from. An answer found in
+        several places goes to the sentence sharing most words with the question
+        """
+        answer = card['answer'][:200]
+        found = []
+        position = text.find(answer)
+        while position >= 0 and len(found) < 20:
+            found.append(bisect_right(starts, position) - 1)
+            position = text.find(answer, position + 1)
+        
+        if len(found) <= 1:
+            return found[0] if found else None
+        
+        question_words = {word for word in re.findall(r'\w+', card['question'].lower()) if len(word) > 3 or word.isdigit()}
+        return max(found, key=lambda index: len(question_words & set(re.findall(r'\w+', sentences[index].lower()))))
+    
+    def _extract_cards(self, parsed: ParsedDocument, tier: str = 'full',
+                       deadline: Optional[float] = None, qg_deadline: Optional[float] = None) -> List[Dict]:
+        """Run the extractors of a tier over a parsed document"""
         all_cards = []
+        _check_deadline(deadline)
         
         # method 1: definition-based cards
-        definition_cards = self._extract_definitions(text)
+        with stage('definitions'):
+            definition_cards = self._extract_definitions(parsed)
         all_cards.extend(definition_cards)
-        print(f"Generated {len(definition_cards)} definition cards")
         
         # method 2: entity-based cards
+        entity_cards = []
         if self.nlp:
-            entity_cards = self._extract_entities(text)
+            with stage('entities'):
+                entity_cards = self._extract_entities(parsed)
             all_cards.extend(entity_cards)
-            print(f"Generated {len(entity_cards)} entity cards")
         
         # method 3: key concept cards
-        concept_cards = self._extract_key_concepts(text)
+        with stage('concepts'):
+            concept_cards = self._extract_key_concepts(parsed)
         all_cards.extend(concept_cards)
-        print(f"Generated {len(concept_cards)} concept cards")
+        _check_deadline(deadline)
         
         # method 4: AI-generated questions
-        if self.qg_model:
-            ai_cards = self._generate_ai_questions(text)
+        ai_cards = []
+        if tier == 'full' and self.qg_model:
+            with stage('ai_questions'):
+                ai_cards = self._generate_ai_questions(parsed, deadline, qg_deadline)
             all_cards.extend(ai_cards)
-            print(f"Generated {len(ai_cards)} AI cards")
         
         # method 5: relationship cards
+        relation_cards = []
         if self.nlp:
-            relation_cards = self._extract_relationships(text)
+            with stage('relationships'):
+                relation_cards = self._extract_relationships(parsed)
             all_cards.extend(relation_cards)
-            print(f"Generated {len(relation_cards)} relationship cards")
         
-        # remove duplicates and rank by quality
-        unique_cards = self._deduplicate_cards(all_cards)
-        ranked_cards = self._rank_cards(unique_cards)
+        log.debug("Generated %d definition, %d entity, %d concept, %d AI and %d relationship cards",
+                  len(definition_cards), len(entity_cards), len(concept_cards), len(ai_cards), len(relation_cards))
+        return all_cards
+    
+    def _select_cards(self, all_cards: List[Dict], max_cards: int, tier: str = 'full') -> List[Dict]:
+        """Remove duplicates, rank by quality and keep the top cards"""
+        with stage('dedup'):
+            unique_cards = self._deduplicate_cards(all_cards, semantic=tier == 'full')
+        with stage('rank'):
+            ranked_cards = self._rank_cards(unique_cards)
         
         # return top cards
         final_cards = ranked_cards[:max_cards]
-        print(f"Returning {len(final_cards)} flashcards")
+        log.debug("Returning %d of %d flashcards", len(final_cards), len(all_cards))
         
         return final_cards
     
-    def _extract_definitions(self, text: str) -> List[Dict]:
+    def parse(self, text: str, tier: str = 'full') -> ParsedDocument:
+        """Build the shared parse for a text, running only the spaCy components the tier reads"""
+        if not self.nlp:
+            return ParsedDocument(text)
+        return ParsedDocument(text, doc=self.nlp(text, disable=self._disabled_pipes(tier)))
+    
+    def parse_many(self, items: Iterable[Tuple[str, Any]], tier: str = 'full') -> Iterator[Tuple[ParsedDocument, Any]]:
+        """
+        Parse (text, context) pairs lazily through nlp.pipe, in batches of
+        pipe_batch_size texts across pipe_processes processes.
+        Yields (parse, context) in input order
+        """
+        if not self.nlp:
+            for text, context in items:
+                yield ParsedDocument(text), context
+            return
+        
+        # workers of the NLP pool are daemons and cannot start processes of their own
+        processes = 1 if mp.current_process().daemon else self.pipe_processes
+        docs = self.nlp.pipe(items, as_tuples=True, batch_size=self.pipe_batch_size,
+                             n_process=processes, disable=self._disabled_pipes(tier))
+        for doc, context in docs:
+            yield ParsedDocument(doc.text, doc=doc), context
+    
+    def _disabled_pipes(self, tier: str) -> List[str]:
+        """spaCy components a tier's extractors never read"""
+        if tier not in self._pipe_disable:
+            nlp = self.nlp
+            wanted = set(SPACY_COMPONENTS.get(tier, SPACY_COMPONENTS['full']))
+            if 'senter' in wanted and 'senter' not in nlp.pipe_names:
+                # pipelines without a sentence splitter get sentences from the parser
+                wanted = (wanted - {'senter'}) | {'parser'}
+            if 'parser' in wanted:
+                # the parser sets sentence boundaries itself
+                wanted.discard('senter')
+            # shared embeddings run when a wanted component listens to them
+            if 'tok2vec' in nlp.pipe_names:
+                listeners = getattr(nlp.get_pipe('tok2vec'), 'listening_components', ())
+                if wanted & set(listeners):
+                    wanted.add('tok2vec')
+            self._pipe_disable[tier] = [name for name in nlp.pipe_names if name not in wanted]
+        return self._pipe_disable[tier]
+    
+    def _extract_definitions(self, parsed: ParsedDocument) -> List[Dict]:
         """Extract definition-style flashcards"""
         cards = []
         
-        # patterns for definitions
-        patterns = [
-            r'(.+?)\s+is\s+(?:a|an|the)?\s*(.+?)[\.\,\;]',
-            r'(.+?)\s+are\s+(.+?)[\.\,\;]',
-            r'(.+?)\s+refers to\s+(.+?)[\.\,\;]',
-            r'(.+?)\s+means\s+(.+?)[\.\,\;]',
-            r'(.+?)\s+can be defined as\s+(.+?)[\.\,\;]',
-            r'The term\s+(.+?)\s+means\s+(.+?)[\.\,\;]',
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                term = match.group(1).strip()
-                definition = match.group(2).strip()
+        # scan sentence by sentence, trying the pattern at each clause start
+        for sentence in parsed.sentences:
+            for start in [0] + [m.end() for m in CLAUSE_BREAK.finditer(sentence)]:
+                match = DEFINITION_PATTERN.match(sentence, start)
+                if not match:
+                    continue
+                
+                term = match.group('term').strip()
+                definition = match.group('definition').strip()
                 
                 # clean up
                 if len(term) > 3 and len(definition) > 10 and len(term) < 100:
@@ -127,18 +545,16 @@ class FlashcardGenerator:
         
         return cards
     
-    def _extract_entities(self, text: str) -> List[Dict]:
+    def _extract_entities(self, parsed: ParsedDocument) -> List[Dict]:
         """Extract named entity flashcards"""
         cards = []
         
-        if not self.nlp:
+        if parsed.doc is None:
             return cards
         
-        doc = self.nlp(text)
-        
         # group entities by type
         entities_by_type = {}
-        for ent in doc.ents:
+        for ent in parsed.doc.ents:
             if ent.label_ not in entities_by_type:
                 entities_by_type[ent.label_] = []
             entities_by_type[ent.label_].append(ent.text)
@@ -149,7 +565,7 @@ class FlashcardGenerator:
                 # create "What is X?" cards
                 for entity in entities[:3]:  # limit per type
                     # find context sentence
-                    context = self._get_entity_context(text, entity)
+                    context = self._get_entity_context(parsed, entity)
                     if context:
                         cards.append({
                             'question': f'What is {entity}?',
@@ -160,14 +576,11 @@ class FlashcardGenerator:
         
         return cards
     
-    def _extract_key_concepts(self, text: str) -> List[Dict]:
+    def _extract_key_concepts(self, parsed: ParsedDocument) -> List[Dict]:
         """Extract key concepts using keyword extraction"""
         cards = []
         
-        # split into sentences
-        sentences = nltk.sent_tokenize(text)
-        
-        for sentence in sentences:
+        for sentence, words in zip(parsed.sentences, parsed.sentence_tokens):
             if len(sentence) < 20 or len(sentence) > 300:
                 continue
             
@@ -176,9 +589,7 @@ class FlashcardGenerator:
                              'note that', 'remember', 'main', 'primary']
             
             if any(word in sentence.lower() for word in important_words):
-                # extract the main concept
-                words = nltk.word_tokenize(sentence)
-                # remove stopwords
+                # extract the main concept, remove stopwords
                 keywords = [w for w in words if w.lower() not in self.stopwords and len(w) > 3]
                 
                 if keywords:
@@ -192,36 +603,43 @@ class FlashcardGenerator:
         
         return cards[:5]  # limit key concept cards
     
-    def _generate_ai_questions(self, text: str) -> List[Dict]:
-        """Use transformer model to generate questions"""
+    def _generate_ai_questions(self, parsed: ParsedDocument, deadline: Optional[float] = None,
+                               qg_deadline: Optional[float] = None) -> List[Dict]:
+        """Use transformer model to generate questions, until qg_deadline (default: qg_time_budget from now)"""
         cards = []
         
         if not self.qg_model:
             return cards
         
-        # split text into chunks
-        sentences = nltk.sent_tokenize(text)
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < 512:  # model max length
-                current_chunk += " " + sentence
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        # generate questions for each chunk
-        for chunk in chunks[:3]:  # limit to first 3 chunks
+        chunks = self._chunk_sentences(parsed)
+        # stop at the end of the question budget or the caller's deadline, whichever is first
+        if qg_deadline is None:
+            qg_deadline = time.monotonic() + self.qg_time_budget
+        deadline = qg_deadline if deadline is None else min(qg_deadline, deadline)
+        
+        # generate questions for all chunks, one batch per forward pass
+        for batch_start in range(0, len(chunks), self.qg_batch_size):
+            if time.monotonic() > deadline:
+                log.info("AI question generation stopped after %d of %d chunks (time budget)", batch_start, len(chunks))
+                break
+            
+            batch = chunks[batch_start:batch_start + self.qg_batch_size]
+            texts = [' '.join(parsed.sentences[first:last + 1]) for first, last in batch]
+            # highlight important parts (simple approach)
+            highlighted = [self._highlight_text(parsed, first, last, chunk)
+                           for (first, last), chunk in zip(batch, texts)]
+            
             try:
-                # highlight important parts (simple approach)
-                highlighted = self._highlight_text(chunk)
-                result = self.qg_model(highlighted, max_length=64, num_return_sequences=2)
-                
+                results = self.qg_model(highlighted, max_length=64, num_return_sequences=2,
+                                        batch_size=len(highlighted), truncation=True)
+            except Exception as e:
+                log.warning("AI question generation error: %s", e)
+                continue
+            
+            for chunk, result in zip(texts, results):
+                # a single input comes back as a flat list of sequences
+                if isinstance(result, dict):
+                    result = [result]
                 for item in result:
                     question = item['generated_text']
                     if question and '?' in question:
@@ -231,24 +649,49 @@ class FlashcardGenerator:
                             'type': 'ai_generated',
                             'confidence': 0.85
                         })
-            except Exception as e:
-                print(f"AI question generation error: {e}")
-                continue
         
         return cards
     
-    def _extract_relationships(self, text: str) -> List[Dict]:
+    def _chunk_sentences(self, parsed: ParsedDocument) -> List[Tuple[int, int]]:
+        """Group sentences into (first, last) index ranges that fit the model's token budget"""
+        if not parsed.sentences:
+            return []
+        
+        tokenizer = getattr(self.qg_model, 'tokenizer', None)
+        if tokenizer is not None:
+            budget = min(self.qg_max_tokens, getattr(tokenizer, 'model_max_length', self.qg_max_tokens))
+            # room for the highlight markers and end-of-sequence token
+            budget -= 8
+            lengths = [len(ids) for ids in
+                       tokenizer(parsed.sentences, add_special_tokens=False)['input_ids']]
+        else:
+            # rough character budget when no tokenizer is available
+            budget = self.qg_max_tokens
+            lengths = [len(sentence) + 1 for sentence in parsed.sentences]
+        
+        chunks = []
+        chunk_start = 0
+        chunk_len = 0
+        
+        for i, length in enumerate(lengths):
+            if i > chunk_start and chunk_len + length > budget:
+                chunks.append((chunk_start, i - 1))
+                chunk_start = i
+                chunk_len = 0
+            chunk_len += length
+        
+        chunks.append((chunk_start, len(lengths) - 1))
+        return chunks
+    
+    def _extract_relationships(self, parsed: ParsedDocument) -> List[Dict]:
         """Extract relationship-based flashcards"""
         cards = []
         
-        if not self.nlp:
+        if parsed.doc is None:
             return cards
         
-        doc = self.nlp(text)
-        
         # look for cause-effect relationships
-        for sent in doc.sents:
-            sent_text = sent.text
+        for sent_text in parsed.sentences:
             
             # cause-effect patterns
             if 'because' in sent_text.lower():
@@ -271,26 +714,53 @@ class FlashcardGenerator:
         
         return cards[:3]  # limit relationship cards
     
-    def _get_entity_context(self, text: str, entity: str) -> str:
-        """Get the sentence containing the entity"""
-        sentences = nltk.sent_tokenize(text)
-        for sentence in sentences:
-            if entity in sentence:
-                return sentence
-        return ""
+    def _get_entity_context(self, parsed: ParsedDocument, entity: str) -> str:
+        """Get the most informative sentence containing the entity"""
+        best_sentence = ""
+        best_score = 0.0
+        
+        for i in parsed.sentences_with(entity):
+            score = self._context_score(parsed.sentences[i], parsed.sentence_tokens[i], entity)
+            if score > best_score:
+                best_sentence = parsed.sentences[i]
+                best_score = score
+        
+        return best_sentence
+    
+    def _context_score(self, sentence: str, tokens: List[str], entity: str) -> float:
+        """Score how well a sentence explains an entity"""
+        if len(sentence) < 20 or len(sentence) > 300:
+            # fragments and run-ons are kept only as a last resort
+            return 0.1
+        
+        # content words other than the entity itself carry the information
+        entity_words = set(entity.lower().split())
+        content = [t for t in tokens
+                   if t.isalpha() and t.lower() not in self.stopwords and t.lower() not in entity_words]
+        score = 1.0 + min(len(content), 15) / 15
+        
+        # sentences that are about the entity usually start with it
+        position = sentence.find(entity)
+        if 0 <= position < 40:
+            score += 0.5
+        
+        # definitional phrasing
+        if re.search(r'\b(?:is|are|was|were|refers to|means)\b', sentence):
+            score += 0.5
+        
+        return score
     
-    def _highlight_text(self, text: str) -> str:
+    def _highlight_text(self, parsed: ParsedDocument, first: int, last: int, text: str) -> str:
         """Add highlighting for question generation"""
-        # simple approach: highlight first noun phrase
-        if self.nlp:
-            doc = self.nlp(text)
-            for chunk in doc.noun_chunks:
-                return text.replace(chunk.text, f"<hl> {chunk.text} <hl>", 1)
+        # simple approach: highlight first noun phrase of the chunk
+        noun_chunk = parsed.first_noun_chunk(parsed.sentence_starts[first], parsed.sentence_ends[last])
+        if noun_chunk:
+            return text.replace(noun_chunk, f"<hl> {noun_chunk} <hl>", 1)
         return text
     
-    def _deduplicate_cards(self, cards: List[Dict]) -> List[Dict]:
-        """Remove duplicate or very similar flashcards"""
-        if not cards or not self.sentence_model:
+    def _deduplicate_cards(self, cards: List[Dict], semantic: bool = True) -> List[Dict]:
+        """Remove duplicate or very similar flashcards, semantic=False only drops exact repeats"""
+        if not cards:
             return cards
         
         unique_cards = []
@@ -307,7 +777,71 @@ class FlashcardGenerator:
             unique_cards.append(card)
             seen_questions.add(question_lower)
         
-        return unique_cards
+        if not semantic or len(unique_cards) < 2 or not self.sentence_model:
+            return unique_cards
+        
+        # embed all questions and answers in one batched call
+        n = len(unique_cards)
+        texts = [card['question'] for card in unique_cards] + [card['answer'] for card in unique_cards]
+        embeddings = self.sentence_model.encode(texts, batch_size=64, convert_to_numpy=True,
+                                                normalize_embeddings=True, show_progress_bar=False)
+        
+        # a card is represented by its question and answer together
+        vectors = embeddings[:n] + embeddings[n:]
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        
+        if n <= self.dedup_exact_limit:
+            keep = self._near_duplicates_blocked(vectors)
+        else:
+            keep = self._near_duplicates_lsh(vectors)
+        
+        return [card for card, kept in zip(unique_cards, keep) if kept]
+    
+    def _near_duplicates_blocked(self, vectors: np.ndarray, block_size: int = 256) -> np.ndarray:
+        """
+        Keep mask for cards not similar to an earlier kept card, computing
+        similarities one block of rows at a time against the rows before it
+        """
+        n = len(vectors)
+        keep = np.ones(n, dtype=bool)
+        
+        for block_start in range(0, n, block_size):
+            block_end = min(block_start + block_size, n)
+            similar = (vectors[block_start:block_end] @ vectors[:block_end].T) >= self.dedup_threshold
+            
+            for row, j in enumerate(range(block_start, block_end)):
+                if np.any(similar[row, :j] & keep[:j]):
+                    keep[j] = False
+        
+        return keep
+    
+    def _near_duplicates_lsh(self, vectors: np.ndarray, tables: int = 8, bits: int = 8) -> np.ndarray:
+        """
+        Keep mask using random-hyperplane hashing, so each card is only
+        compared with kept cards sharing a bucket in one of the tables
+        """
+        n, dim = vectors.shape
+        planes = np.random.default_rng(0).standard_normal((tables, dim, bits))
+        codes = (np.einsum('nd,tdb->tnb', vectors, planes) > 0) @ (1 << np.arange(bits))
+        
+        buckets = [{} for _ in range(tables)]
+        keep = np.ones(n, dtype=bool)
+        
+        for j in range(n):
+            candidates = set()
+            for t in range(tables):
+                candidates.update(buckets[t].get(codes[t, j], ()))
+            
+            if candidates:
+                indices = np.fromiter(candidates, dtype=int)
+                if np.max(vectors[indices] @ vectors[j]) >= self.dedup_threshold:
+                    keep[j] = False
+                    continue
+            
+            for t in range(tables):
+                buckets[t].setdefault(codes[t, j], []).append(j)
+        
+        return keep
     
     def _rank_cards(self, cards: List[Dict]) -> List[Dict]:
         """Rank flashcards by quality"""
@@ -330,27 +864,92 @@ class FlashcardGenerator:
 
 # global instance
 _generator = None
+_generator_lock = threading.Lock()
 
 def get_generator():
     """Get or create the global flashcard generator"""
     global _generator
-    if _generator is None:
-        _generator = FlashcardGenerator()
+    with _generator_lock:
+        if _generator is None:
+            _generator = FlashcardGenerator()
     return _generator
 
-def generate_flashcards(text: str, max_cards: int = 15) -> List[Dict]:
+def warmup(components: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+    """
+    Load the global generator's models before taking traffic
+    """
+    return get_generator().warmup(components)
+
+def _deadline(time_budget: Optional[float], expires_at: Optional[float] = None) -> Optional[float]:
+    """time.monotonic() deadline from a budget in seconds and/or a wall clock expiry, the earlier wins"""
+    deadlines = []
+    if time_budget is not None:
+        deadlines.append(time.monotonic() + time_budget)
+    if expires_at is not None:
+        # wall clock, so a deadline set in another process means the same moment
+        deadlines.append(time.monotonic() + expires_at - time.time())
+    return min(deadlines) if deadlines else None
+
+def _simplify(cards: List[Dict]) -> List[Dict]:
+    """Convert cards to the question/answer/type(/page) format stored by the API"""
+    simple = []
+    for card in cards:
+        item = {'question': card['question'], 'answer': card['answer'], 'type': card.get('type', 'other')}
+        if card.get('page') is not None:
+            item['page'] = card['page']
+        simple.append(item)
+    return simple
+
+def generate_flashcards(text: str, max_cards: int = 15, tier: str = 'full',
+                        time_budget: Optional[float] = None) -> List[Dict]:
     """
     Main function to generate flashcards
     """
     generator = get_generator()
-    cards = generator.generate_flashcards(text, max_cards)
+    cards = generator.generate_flashcards(text, max_cards, tier, _deadline(time_budget))
     
     # convert to simple format
-    simple_cards = []
-    for card in cards:
-        simple_cards.append({
-            'question': card['question'],
-            'answer': card['answer']
-        })
-    
-    return simple_cards
\ No newline at end of file
+    return _simplify(cards)
+
+def generate_flashcards_from_sentences(sentences: Iterable[str], max_cards: int = 15, tier: str = 'full',
+                                       time_budget: Optional[float] = None) -> List[Dict]:
+    """
+    Generate flashcards from streamed sentences, e.g. ingest.iter_file_sentences
+    """
+    generator = get_generator()
+    cards = generator.generate_flashcards_from_sentences(sentences, max_cards, tier=tier,
+                                                         deadline=_deadline(time_budget))
+    return _simplify(cards)
+
+def generate_flashcards_from_pages(page_sentences: Iterable[Tuple[Optional[int], str]], max_cards: int = 15,
+                                   tier: str = 'full', time_budget: Optional[float] = None,
+                                   expires_at: Optional[float] = None) -> List[Dict]:
+    """
+    Generate flashcards from (page, sentence) pairs, e.g. ingest.iter_page_sentences.
+    Raises GenerationTimeout when time_budget seconds pass, or the wall
+    clock passes expires_at, before it finishes
+    """
+    generator = get_generator()
+    cards = generator.generate_flashcards_from_pages(page_sentences, max_cards, tier=tier,
+                                                     deadline=_deadline(time_budget, expires_at))
+    return _simplify(cards)
+
+def extract_candidates(page_sentences: Iterable[Tuple[Optional[int], str]], max_cards: int = 15,
+                       tier: str = 'full', time_budget: Optional[float] = None,
+                       expires_at: Optional[float] = None, started_at: Optional[float] = None) -> List[Dict]:
+    """
+    Candidate cards of one part of a document, before dedup and ranking
+    across the whole document with select_cards. started_at is when
+    generation of the whole document started (time.time()), question
+    generation across all its parts ends qg_time_budget after it
+    """
+    generator = get_generator()
+    qg_deadline = _deadline(None, started_at + generator.qg_time_budget) if started_at is not None else None
+    return generator.extract_candidates(page_sentences, max_cards, tier=tier,
+                                        deadline=_deadline(time_budget, expires_at), qg_deadline=qg_deadline)
+
+def select_cards(candidates: List[Dict], max_cards: int = 15, tier: str = 'full') -> List[Dict]:
+    """
+    Dedup, rank and keep the top max_cards of candidates merged from the parts of a document
+    """
+    return _simplify(get_generator()._select_cards(candidates, max_cards, tier))
@@ -0,0 +1,350 @@
+import os
+import time
+import atexit
+import signal
+import logging
+import threading
+import itertools
+import multiprocessing as mp
+from collections import deque
+from multiprocessing.connection import wait
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Tuple
+
+import nlp_processor
+
+log = logging.getLogger(__name__)
+
+def _worker_main(conn, torch_threads: int):
+    """Entry point of an NLP worker process"""
+    # the parent handles ctrl-c and shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # split the cores between workers instead of every worker using all of them
+    if torch_threads:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+
+    # a no-op when the fork server preloaded the models, loaded here otherwise
+    nlp_processor.warmup()
+
+    queued = deque()
+    cancelled = set()
+    while True:
+        try:
+            # wait for work, then take everything else already sent, so a
+            # cancellation reaches requests still queued here
+            if not queued and not _read(conn, queued, cancelled):
+                break
+            while conn.poll():
+                if not _read(conn, queued, cancelled):
+                    return
+        except (EOFError, OSError):
+            break
+        if not queued:
+            continue
+
+        request_id, method, args, expires_at = queued.popleft()
+        if request_id in cancelled:
+            cancelled.discard(request_id)
+            continue
+        # cancellations of requests that already ran
+        cancelled = {cancelled_id for cancelled_id in cancelled if cancelled_id > request_id}
+        if expires_at is not None and time.time() > expires_at:
+            conn.send((request_id, False, "GenerationTimeout: request expired before a worker started it"))
+            continue
+
+        try:
+            cards = getattr(nlp_processor, method)(*args)
+            conn.send((request_id, True, cards))
+        except Exception as e:
+            conn.send((request_id, False, f"{type(e).__name__}: {e}"))
+
+def _read(conn, queued: deque, cancelled: set) -> bool:
+    """Take one message off the pipe, False when the pool asks the worker to stop"""
+    message = conn.recv()
+    if message is None:
+        return False
+    if message[0] == 'cancel':
+        cancelled.add(message[1])
+    else:
+        # ('run', request_id, method, args, expires_at)
+        queued.append(message[1:])
+    return True
+
+# workers are never forked from the server process: it runs threads (the
+# monitor, job and request threads, inference schedulers) whose locks a
+# fork would copy mid-use. forkserver forks them from a clean helper process
+START_METHODS = ('forkserver', 'spawn')
+
+# nlp_processor functions a worker may run
+METHODS = ('generate_flashcards', 'generate_flashcards_from_pages', 'extract_candidates', 'select_cards')
+
+class _Request:
+    def __init__(self, request_id: int, method: str, args: tuple, expires_at: Optional[float] = None):
+        self.request_id = request_id
+        self.method = method
+        self.args = args
+        # wall clock time after which a worker skips the request
+        self.expires_at = expires_at
+        self.attempts = 0
+        self.future = Future()
+
+class _Worker:
+    def __init__(self, index: int, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.inflight: Dict[int, _Request] = {}
+        self.send_lock = threading.Lock()
+
+class NLPWorkerPool:
+    """
+    Pool of worker processes that each hold the NLP models.
+
+    Workers start from a forkserver (spawn where it is unavailable), at
+    startup and on restart alike. With preload the fork server loads the
+    models once (see nlp_preload), and the workers forked from it share
+    them copy-on-write. Requests are routed to the worker with the fewest
+    requests in flight, and a monitor thread restarts workers that die and
+    re-dispatches the requests they held.
+    """
+
+    def __init__(self, workers: Optional[int] = None, start_method: Optional[str] = None,
+                 preload: bool = True, max_attempts: int = 2):
+        self.num_workers = workers or int(os.getenv('NLP_WORKERS', '0')) or os.cpu_count() or 1
+
+        start_method = start_method or os.getenv('NLP_START_METHOD')
+        if not start_method:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        if start_method not in START_METHODS:
+            raise ValueError(f"NLP_START_METHOD must be one of {', '.join(START_METHODS)}")
+        self.ctx = mp.get_context(start_method)
+
+        self.preload = preload and start_method == 'forkserver'
+        self.max_attempts = max_attempts
+        self.torch_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closed = False
+        self._monitor_thread = None
+        self.restarts = 0
+
+    def start(self):
+        """Start the worker processes, each loads the models before taking requests"""
+        if self.preload:
+            # loaded once in the fork server, which every worker is forked from
+            self.ctx.set_forkserver_preload(['nlp_preload'])
+            # the fork server imports from the working directory and PYTHONPATH,
+            # not this process's sys.path, and skips modules it cannot find
+            here = os.path.dirname(os.path.abspath(__file__))
+            paths = [os.getcwd()] + os.getenv('PYTHONPATH', '').split(os.pathsep)
+            if here not in [os.path.abspath(path) for path in paths if path]:
+                log.warning("NLP fork server cannot import nlp_preload from %s, every worker loads its own models", here)
+
+        with self._lock:
+            self._workers = [self._spawn(i) for i in range(self.num_workers)]
+
+        self._monitor_thread = threading.Thread(target=self._monitor, name='nlp-pool-monitor', daemon=True)
+        self._monitor_thread.start()
+        log.info("Started %d NLP workers (%s)", self.num_workers, self.ctx.get_start_method())
+        return self
+
+    def submit(self, text: str, max_cards: int = 15) -> Future:
+        """Queue a generation request, the future resolves to the flashcards"""
+        return self._submit('generate_flashcards', (text, max_cards))
+
+    def submit_pages(self, page_sentences: List[Tuple[Optional[int], str]], max_cards: int = 15,
+                     tier: str = 'full', time_budget: Optional[float] = None,
+                     expires_at: Optional[float] = None) -> Future:
+        """
+        Queue generation from (page, sentence) pairs at a tier. Past
+        expires_at (time.time()) the request is skipped or times out
+        """
+        return self._submit('generate_flashcards_from_pages',
+                            (list(page_sentences), max_cards, tier, time_budget, expires_at), expires_at)
+
+    def submit_candidates(self, page_sentences: List[Tuple[Optional[int], str]], max_cards: int = 15,
+                          tier: str = 'full', expires_at: Optional[float] = None,
+                          started_at: Optional[float] = None) -> Future:
+        """
+        Queue candidate extraction for one shard of a document, started_at
+        is when the document's generation started so its shards share one
+        question generation budget
+        """
+        return self._submit('extract_candidates',
+                            (list(page_sentences), max_cards, tier, None, expires_at, started_at), expires_at)
+
+    def submit_select(self, candidates: List[Dict], max_cards: int = 15, tier: str = 'full') -> Future:
+        """Queue the selection of a document's cards from the candidates of its shards"""
+        return self._submit('select_cards', (candidates, max_cards, tier))
+
+    def generate_flashcards(self, text: str, max_cards: int = 15, timeout: Optional[float] = None) -> List[Dict]:
+        """Generate flashcards on a worker and wait for the result"""
+        return self.submit(text, max_cards).result(timeout=timeout)
+
+    def _submit(self, method: str, args: tuple, expires_at: Optional[float] = None) -> Future:
+        if self._closed:
+            raise RuntimeError("NLP worker pool is shut down")
+        if method not in METHODS:
+            raise ValueError(f"Unknown NLP worker method {method}")
+        request = _Request(next(self._ids), method, args, expires_at)
+        self._dispatch(request)
+        return request.future
+
+    def cancel(self, future: Future) -> bool:
+        """Withdraw a request, its worker skips it unless it already started. False if it was not in flight"""
+        with self._lock:
+            found = [(worker, request) for worker in self._workers
+                     for request in worker.inflight.values() if request.future is future]
+            for worker, request in found:
+                del worker.inflight[request.request_id]
+        future.cancel()
+
+        for worker, request in found:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(('cancel', request.request_id))
+            except (OSError, ValueError):
+                pass
+        return bool(found)
+
+    def stats(self) -> Dict:
+        """Worker liveness and queue depth"""
+        with self._lock:
+            return {
+                'workers': len(self._workers),
+                'alive': sum(1 for w in self._workers if w.process.is_alive()),
+                'inflight': sum(len(w.inflight) for w in self._workers),
+                'restarts': self.restarts
+            }
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop the workers, pending requests fail"""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            for request in worker.inflight.values():
+                if not request.future.done():
+                    request.future.set_exception(RuntimeError("NLP worker pool shut down"))
+            worker.inflight.clear()
+            worker.conn.close()
+
+    def _spawn(self, index: int) -> _Worker:
+        parent_conn, child_conn = self.ctx.Pipe()
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.torch_threads),
+            name=f'nlp-worker-{index}',
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(index, process, parent_conn)
+
+    def _dispatch(self, request: _Request):
+        request.attempts += 1
+        with self._lock:
+            # route to the least busy live worker
+            alive = [w for w in self._workers if w.process.is_alive()] or self._workers
+            worker = min(alive, key=lambda w: len(w.inflight))
+            worker.inflight[request.request_id] = request
+
+        try:
+            with worker.send_lock:
+                worker.conn.send(('run', request.request_id, request.method, request.args, request.expires_at))
+        except (OSError, ValueError):
+            # the worker is dying, the monitor re-dispatches its requests
+            pass
+
+    def _monitor(self):
+        while not self._closed:
+            with self._lock:
+                workers = list(self._workers)
+
+            ready = wait([w.conn for w in workers] + [w.process.sentinel for w in workers], timeout=1.0)
+
+            for worker in workers:
+                if worker.conn in ready:
+                    self._collect(worker)
+                if worker.process.sentinel in ready and not self._closed:
+                    self._restart(worker)
+
+    def _collect(self, worker: _Worker) -> bool:
+        """Resolve one result from a worker, False once its connection is closed"""
+        try:
+            request_id, ok, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            # connection closed, the process sentinel reports the exit
+            return False
+
+        with self._lock:
+            request = worker.inflight.pop(request_id, None)
+        if request is None or request.future.done():
+            return True
+
+        if ok:
+            request.future.set_result(payload)
+        else:
+            request.future.set_exception(RuntimeError(payload))
+        return True
+
+    def _restart(self, worker: _Worker):
+        # pick up results sent just before the exit
+        while worker.conn.poll() and self._collect(worker):
+            pass
+        worker.process.join(1.0)
+
+        log.warning("NLP worker %d exited with code %s, restarting", worker.index, worker.process.exitcode)
+        with self._lock:
+            orphaned = list(worker.inflight.values())
+            worker.inflight.clear()
+            self._workers[worker.index] = self._spawn(worker.index)
+            self.restarts += 1
+        worker.conn.close()
+
+        for request in orphaned:
+            if request.future.done():
+                # cancelled by the caller
+                continue
+            if request.attempts < self.max_attempts:
+                self._dispatch(request)
+            else:
+                request.future.set_exception(RuntimeError("NLP worker crashed while generating flashcards"))
+
+# global instance
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> NLPWorkerPool:
+    """Get or start the global NLP worker pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = NLPWorkerPool().start()
+            # stop the workers before exit, or the monitor restarts them as they die
+            atexit.register(_pool.shutdown)
+    return _pool
+
+def generate_flashcards(text: str, max_cards: int = 15, timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Generate flashcards on the worker pool
+    """
+    return get_pool().generate_flashcards(text, max_cards, timeout)
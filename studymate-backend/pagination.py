@@ -0,0 +1,54 @@
+import json
+import base64
+from typing import Any, Callable, Dict, Iterable, Optional
+from flask import Response, stream_with_context
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(position: Dict) -> str:
+    """Opaque cursor token for a keyset position"""
+    raw = json.dumps(position, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token: Optional[str], **fields: Callable[[Any], Any]) -> Optional[Dict]:
+    """
+    Keyset position from a cursor token, None for the first page.
+    fields maps each key the position must have to a parser for its value,
+    any failure raises InvalidCursor
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    if not isinstance(position, dict):
+        raise InvalidCursor("Invalid cursor: not a position")
+
+    parsed = {}
+    for key, parse in fields.items():
+        if key not in position:
+            raise InvalidCursor(f"Invalid cursor: missing {key}")
+        try:
+            parsed[key] = parse(position[key])
+        except Exception as e:
+            # parsers raise their own errors, bson's InvalidId is not a ValueError
+            raise InvalidCursor(f"Invalid cursor: bad {key}: {e}")
+    return parsed
+
+def page_limit(value: Optional[str], default: int, maximum: int) -> int:
+    """Page size from a query parameter, clamped to [1, maximum]"""
+    try:
+        limit = int(value) if value else default
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+def ndjson_response(items: Iterable[Dict]) -> Response:
+    """Stream one JSON document per line as items are produced"""
+    def generate():
+        for item in items:
+            yield json.dumps(item, default=str) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
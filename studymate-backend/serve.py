@@ -0,0 +1,59 @@
+import sys
+import logging
+from gunicorn.app.base import BaseApplication
+from config import get_config
+from logging_setup import configure_logging
+
+log = logging.getLogger(__name__)
+
+class StudyMateServer(BaseApplication):
+    """
+    Gunicorn running app.py with gthread workers. The NLP models load once
+    in the master before forking so workers share them copy-on-write, while
+    the app itself (Mongo client, job threads) is imported in each worker
+    since neither survives a fork.
+    """
+
+    def __init__(self, config=None):
+        self.settings = config or get_config()
+        super().__init__()
+
+    def load_config(self):
+        settings = self.settings
+        options = {
+            'bind': f"{settings.HOST}:{settings.PORT}",
+            'workers': settings.WORKERS,
+            'worker_class': 'gthread',
+            'threads': settings.THREADS,
+            'timeout': settings.TIMEOUT,
+            'graceful_timeout': settings.GRACEFUL_TIMEOUT,
+            'keepalive': settings.KEEPALIVE,
+            'max_requests': settings.MAX_REQUESTS,
+            'max_requests_jitter': settings.MAX_REQUESTS_JITTER,
+            'preload_app': False,
+            'accesslog': '-',
+            'on_starting': self.on_starting,
+            'worker_exit': self.worker_exit,
+        }
+        for key, value in options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app
+
+    def on_starting(self, server):
+        configure_logging(self.settings.LOG_LEVEL, self.settings.LOG_FORMAT)
+        if self.settings.PRELOAD_NLP:
+            import nlp_processor
+            log.info("Preloaded NLP models", extra={'components': nlp_processor.warmup()})
+
+    def worker_exit(self, server, worker):
+        # queued jobs stay in Mongo, the other workers' job sweeps pick them up
+        app = sys.modules.get('app')
+        if app is not None:
+            app.job_queue.shutdown(wait=False, cancel_pending=True)
+
+# run: STUDYMATE_ENV=production python serve.py
+if __name__ == '__main__':
+    StudyMateServer().run()
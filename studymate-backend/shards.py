@@ -0,0 +1,75 @@
+import os
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ingest import SENTENCE_BOUNDARY
+
+# characters of text parsed at once. spaCy refuses texts over nlp.max_length
+# (1,000,000 by default) and a Doc needs memory many times its text size, so
+# a document is processed as shards of this size however long it is
+SHARD_CHARS = int(os.getenv('NLP_SHARD_CHARS', '100000'))
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+Page = Tuple[Optional[int], str]
+
+def _paragraphs(text: str) -> Iterator[str]:
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+def _cut(text: str, max_chars: int) -> Iterator[str]:
+    """Text over max_chars cut at the last space inside the limit"""
+    while len(text) > max_chars:
+        cut = text.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield text[:cut]
+        text = text[cut:]
+    yield text
+
+def _pieces(text: str, max_chars: int) -> Iterator[str]:
+    """Paragraphs, and the sentences of paragraphs too long for a shard"""
+    for paragraph in _paragraphs(text):
+        if len(paragraph) <= max_chars:
+            pieces = [paragraph]
+        else:
+            pieces = (piece for sentence in SENTENCE_BOUNDARY.split(paragraph) for piece in _cut(sentence, max_chars))
+        for piece in pieces:
+            piece = piece.strip()
+            if piece:
+                yield piece
+
+def split_text(text: str, max_chars: int = SHARD_CHARS) -> Iterator[str]:
+    """Consecutive shards of at most max_chars, cut between paragraphs, or sentences of long ones"""
+    shard: List[str] = []
+    size = 0
+    for piece in _pieces(text, max_chars):
+        if shard and size + len(piece) > max_chars:
+            yield '\n\n'.join(shard)
+            shard, size = [], 0
+        shard.append(piece)
+        size += len(piece) + 2
+    if shard:
+        yield '\n\n'.join(shard)
+
+def shard_pages(page_sentences: Iterable[Page], max_chars: int = SHARD_CHARS) -> Iterator[List[Page]]:
+    """
+    Group (page, sentence) pairs into shards of at most max_chars of
+    joined text. A shard that is mostly full ends at the next page break
+    """
+    shard: List[Page] = []
+    size = 0
+    for page, sentence in page_sentences:
+        for piece in _cut(sentence, max_chars - 1):
+            length = len(piece) + 1
+            page_break = bool(shard) and page != shard[-1][0]
+            if shard and (size + length > max_chars or (page_break and size >= max_chars * 3 // 4)):
+                yield shard
+                shard, size = [], 0
+            shard.append((page, piece))
+            size += length
+    if shard:
+        yield shard
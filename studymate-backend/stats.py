@@ -0,0 +1,104 @@
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from mongo import MongoConnection
+
+def count_by_type(flashcards: List[Dict]) -> Dict[str, int]:
+    counts = {}
+    for card in flashcards:
+        card_type = card.get('type', 'other')
+        counts[card_type] = counts.get(card_type, 0) + 1
+    return counts
+
+class UserStats:
+    """
+    Per-user counters kept in one document per user, updated with $inc
+    whenever files or cards are added or removed, so reading them is a
+    single _id lookup.
+    """
+
+    def __init__(self, stats_collection, files_collection, flashcards_collection):
+        self.stats = stats_collection
+        self.files = files_collection
+        self.cards = flashcards_collection
+
+    def record(self, user_id: str, files: int = 0, size: int = 0, cards_by_type: Optional[Dict[str, int]] = None):
+        """
+        Apply a change to a user's counters in one atomic update.
+        Call after the change is written to files/flashcards
+        """
+        inc = {}
+        if files:
+            inc['total_files'] = files
+        if size:
+            inc['total_bytes'] = size
+        for card_type, count in (cards_by_type or {}).items():
+            if count:
+                inc[f'cards_by_type.{card_type}'] = count
+                inc['total_cards'] = inc.get('total_cards', 0) + count
+        if not inc:
+            return
+
+        result = self.stats.update_one(
+            {'_id': user_id},
+            {'$inc': inc, '$set': {'updated_at': datetime.now()}}
+        )
+        if result.matched_count == 0:
+            # first change for this user, the source data already includes it
+            self.reconcile(user_id)
+
+    def get(self, user_id: str) -> Dict:
+        """A user's counters, rebuilt from source data if they were never recorded"""
+        doc = self.stats.find_one({'_id': user_id})
+        if doc is None:
+            doc = self.reconcile(user_id)
+        return {
+            'total_files': doc.get('total_files', 0),
+            'total_cards': doc.get('total_cards', 0),
+            'total_bytes': doc.get('total_bytes', 0),
+            'cards_by_type': doc.get('cards_by_type', {})
+        }
+
+    def reconcile(self, user_id: str) -> Dict:
+        """Rebuild a user's counters from the files and flashcards collections"""
+        file_totals = list(self.files.aggregate([
+            {'$match': {'user_id': user_id}},
+            {'$group': {'_id': None, 'files': {'$sum': 1}, 'bytes': {'$sum': '$size'}}}
+        ]))
+        card_totals = self.cards.aggregate([
+            {'$match': {'user_id': user_id}},
+            {'$group': {'_id': {'$ifNull': ['$type', 'other']}, 'count': {'$sum': 1}}}
+        ])
+
+        cards_by_type = {row['_id']: row['count'] for row in card_totals}
+        doc = {
+            'total_files': file_totals[0]['files'] if file_totals else 0,
+            'total_bytes': file_totals[0]['bytes'] if file_totals else 0,
+            'total_cards': sum(cards_by_type.values()),
+            'cards_by_type': cards_by_type,
+            'updated_at': datetime.now()
+        }
+        self.stats.replace_one({'_id': user_id}, doc, upsert=True)
+        doc['_id'] = user_id
+        return doc
+
+    def reconcile_all(self) -> int:
+        """Rebuild the counters of every user with files, returns the user count"""
+        user_ids = self.files.distinct('user_id')
+        for user_id in user_ids:
+            self.reconcile(user_id)
+        # users whose files are all gone
+        self.stats.delete_many({'_id': {'$nin': user_ids}})
+        return len(user_ids)
+
+# run: python stats.py [user_id]
+if __name__ == '__main__':
+    load_dotenv()
+    db = MongoConnection().connect().db
+    user_stats = UserStats(db['user_stats'], db['files'], db['flashcards'])
+
+    if len(sys.argv) > 1:
+        print(user_stats.reconcile(sys.argv[1]))
+    else:
+        print(f"Reconciled stats of {user_stats.reconcile_all()} users")
@@ -0,0 +1,141 @@
+import os
+import uuid
+import tempfile
+from datetime import datetime
+from pymongo import ReturnDocument
+from ingest import StreamingIngest
+
+class BlobStore:
+    """
+    Content-addressed upload storage. Files are stored once under their
+    SHA-256 and reference counted in Mongo, so identical uploads share a
+    blob and a blob is removed only when its last file is deleted.
+    """
+
+    def __init__(self, root: str, blobs_collection):
+        self.root = root
+        self.blobs = blobs_collection
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path_for(self, content_hash: str, generation: str = '') -> str:
+        name = f"{content_hash}-{generation}" if generation else content_hash
+        return os.path.join(self.root, content_hash[:2], name)
+
+    def save(self, stream):
+        """
+        Store an upload stream, hashing it while it is written.
+        Returns (content_hash, size, path) and takes a reference on the blob.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                ingest = StreamingIngest(stream, sink=out).drain()
+
+            content_hash = ingest.sha256
+            size = ingest.size
+
+            # take the reference before the blob is placed so a concurrent
+            # release of the same content cannot remove it. each record
+            # generation gets its own path, so a release that deleted the
+            # previous record only ever unlinks that generation's file
+            blob = self.blobs.find_one_and_update(
+                {'_id': content_hash},
+                {
+                    '$inc': {'refs': 1},
+                    '$setOnInsert': {
+                        'size': size,
+                        'path': self.path_for(content_hash, uuid.uuid4().hex),
+                        'created_at': datetime.now()
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            path = blob['path']
+
+            # a record this save created always gets the file placed, a
+            # concurrent save of the same content writes identical bytes
+            if blob['refs'] == 1 or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return content_hash, size, path
+
+    def release(self, content_hash: str) -> bool:
+        """Drop a reference, removes the blob when unused. Returns True if removed"""
+        blob = self.blobs.find_one_and_update(
+            {'_id': content_hash},
+            {'$inc': {'refs': -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if blob is None or blob['refs'] > 0:
+            return False
+
+        # only the caller that deletes the record removes the file, and only
+        # the file of that record's generation
+        path = blob.get('path') or self.path_for(content_hash)
+        result = self.blobs.delete_one({'_id': content_hash, 'path': path, 'refs': {'$lte': 0}})
+        if result.deleted_count == 0:
+            return False
+
+        if os.path.exists(path):
+            os.remove(path)
+        return True
+
+class FlashcardCache:
+    """Generated flashcards keyed by (content hash, generator version, max_cards)"""
+
+    def __init__(self, cache_collection):
+        self.cache = cache_collection
+
+    @staticmethod
+    def _key(content_hash: str, generator_version: str, max_cards) -> str:
+        return f"{content_hash}:{generator_version}:{max_cards}"
+
+    def get(self, content_hash: str, generator_version: str, max_cards=None):
+        """Cached flashcards, None on a miss"""
+        entry = self.cache.find_one({'_id': self._key(content_hash, generator_version, max_cards)})
+        return entry['flashcards'] if entry else None
+
+    def put(self, content_hash: str, generator_version: str, max_cards, flashcards):
+        self.cache.replace_one(
+            {'_id': self._key(content_hash, generator_version, max_cards)},
+            {
+                'content_hash': content_hash,
+                'generator_version': generator_version,
+                'max_cards': max_cards,
+                'flashcards': flashcards,
+                'created_at': datetime.now()
+            },
+            upsert=True
+        )
+
+class TextCache:
+    """Text extracted from documents keyed by (content hash, extractor version)"""
+
+    def __init__(self, cache_collection):
+        self.cache = cache_collection
+
+    def get(self, content_hash: str, extractor_version: str):
+        """Cached (page, text) pairs, None on a miss"""
+        entry = self.cache.find_one({'_id': f"{content_hash}:{extractor_version}"})
+        return [tuple(page) for page in entry['pages']] if entry else None
+
+    def put(self, content_hash: str, extractor_version: str, pages):
+        self.cache.replace_one(
+            {'_id': f"{content_hash}:{extractor_version}"},
+            {
+                'content_hash': content_hash,
+                'extractor_version': extractor_version,
+                'pages': [list(page) for page in pages],
+                'created_at': datetime.now()
+            },
+            upsert=True
+        )
@@ -0,0 +1,84 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from db_indexes import INDEXES, ROUTE_QUERIES, SUPERSEDED, check_query_plans, ensure_indexes
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+def _keys(collection):
+    return [list(info['key']) for info in collection.index_information().values()]
+
+def test_ensure_indexes_creates_every_index(db):
+    names = ensure_indexes(db)
+    assert len(names) == sum(len(indexes) for indexes in INDEXES.values())
+    for collection_name, indexes in INDEXES.items():
+        existing = _keys(db[collection_name])
+        for keys, _ in indexes:
+            assert keys in existing
+
+def test_ensure_indexes_drops_superseded_indexes(db):
+    for collection_name, superseded in SUPERSEDED.items():
+        for keys in superseded:
+            db[collection_name].create_index(keys)
+
+    ensure_indexes(db)
+    for collection_name, superseded in SUPERSEDED.items():
+        existing = _keys(db[collection_name])
+        for keys in superseded:
+            assert keys not in existing
+
+def test_ensure_indexes_is_idempotent(db):
+    first = ensure_indexes(db)
+    assert ensure_indexes(db) == first
+
+def test_unique_google_id(db):
+    ensure_indexes(db)
+    db.users.insert_one({'google_id': 'a'})
+    with pytest.raises(mongomock.DuplicateKeyError):
+        db.users.insert_one({'google_id': 'a'})
+
+def test_check_query_plans_without_explain(db):
+    # mongomock cursors have no explain(), every route is reported as skipped
+    ensure_indexes(db)
+    results = check_query_plans(db)
+    assert [r['name'] for r in results] == [name for name, _, _, _ in ROUTE_QUERIES]
+    assert all(r['skipped'] and not r['collscan'] for r in results)
+
+class _Cursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def sort(self, sort):
+        return self
+
+    def explain(self):
+        return {'queryPlanner': {'winningPlan': self.plan}}
+
+class _Collection:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def find(self, query):
+        return _Cursor(self.plan)
+
+class _Db:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def __getitem__(self, name):
+        return _Collection(self.plan)
+
+def test_check_query_plans_reports_collscan():
+    plan = {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}
+    results = check_query_plans(_Db(plan))
+    assert all(r['collscan'] and not r['skipped'] for r in results)
+    assert results[0]['stages'] == ['SORT', 'COLLSCAN']
+
+def test_check_query_plans_accepts_index_scans():
+    plan = {'stage': 'FETCH', 'inputStage': {'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN'}, {'stage': 'IXSCAN'}]}}
+    results = check_query_plans(_Db(plan))
+    assert not any(r['collscan'] for r in results)
+    assert results[0]['stages'] == ['FETCH', 'OR', 'IXSCAN', 'IXSCAN']
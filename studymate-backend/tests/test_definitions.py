@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from benchmarks.corpus import pathological
+from nlp_processor import FlashcardGenerator, ParsedDocument
+
+SIZE = 1024 * 1024
+
+# seconds _extract_definitions may take on 1 MB, the old lazy scans took many
+TIME_LIMIT = 2.0
+
+def _clauses(size: int, separator: str) -> str:
+    """One sentence of short clauses, each a definition the pattern is tried on"""
+    clause = 'the cell membrane is a thin layer around the cell' + separator + ' '
+    return (clause * (size // len(clause) + 1))[:size]
+
+def _run(text: str):
+    generator = FlashcardGenerator(offline=True)
+    parsed = ParsedDocument(text)
+    started = time.monotonic()
+    cards = generator._extract_definitions(parsed)
+    return cards, time.monotonic() - started
+
+@pytest.mark.parametrize('name', ['no_punctuation', 'long_clause', 'only_is'])
+def test_pathological_input_is_linear(name):
+    text = pathological(SIZE)[name]
+    cards, elapsed = _run(text)
+    assert elapsed < TIME_LIMIT, f"{name}: {elapsed:.2f}s"
+    for card in cards:
+        assert 3 < len(card['question']) and len(card['answer']) > 10
+
+@pytest.mark.parametrize('separator', [',', ';', ':'])
+def test_clause_heavy_input_is_linear(separator):
+    cards, elapsed = _run(_clauses(SIZE, separator))
+    assert elapsed < TIME_LIMIT, f"{elapsed:.2f}s"
+    assert cards
+    assert cards[0]['question'] == 'What is the cell membrane?'
+    assert cards[0]['answer'] == 'thin layer around the cell'
+
+def test_only_commas_is_linear():
+    cards, elapsed = _run(', ' * (SIZE // 2))
+    assert elapsed < TIME_LIMIT, f"{elapsed:.2f}s"
+    assert cards == []
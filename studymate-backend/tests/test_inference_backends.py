@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import inference_backends
+from inference_backends import QG_MODEL_NAME, SENTENCE_MODEL_NAME
+
+# how far int8 and ONNX may drift from fp32 before cards change noticeably
+MIN_COSINE_MEAN = 0.98
+MIN_DEDUP_AGREEMENT = 0.99
+MIN_QUESTION_OVERLAP = 0.7
+
+TEXTS = 16
+
+def _cached(name: str) -> bool:
+    """Whether a model is in the local Hugging Face cache, the test never downloads one"""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    return isinstance(try_to_load_from_cache(name, 'config.json'), str)
+
+def _require(backend: str, name: str, *modules: str):
+    for module in modules:
+        pytest.importorskip(module)
+    if not _cached(name):
+        pytest.skip(f"{name} is not in the local model cache")
+    if backend == 'onnx':
+        pytest.importorskip('optimum.onnxruntime')
+        if not os.path.isdir(inference_backends.onnx_path(name)):
+            pytest.skip(f"no exported ONNX graphs for {name} in {inference_backends.ONNX_CACHE_DIR}")
+
+@pytest.fixture(scope='module')
+def texts():
+    from benchmarks.accuracy import _sample_texts
+    return _sample_texts(TEXTS)
+
+@pytest.mark.parametrize('backend', ['int8', 'onnx'])
+def test_embeddings_match_fp32(backend, texts):
+    _require(backend, SENTENCE_MODEL_NAME, 'torch', 'sentence_transformers')
+    from benchmarks.accuracy import compare_embeddings
+
+    result = compare_embeddings(backend, texts)
+    assert result['cosine_mean'] >= MIN_COSINE_MEAN, result
+    assert result['dedup_pair_agreement'] >= MIN_DEDUP_AGREEMENT, result
+
+@pytest.mark.parametrize('backend', ['int8', 'onnx'])
+def test_questions_match_fp32(backend, texts):
+    _require(backend, QG_MODEL_NAME, 'torch', 'transformers')
+    from benchmarks.accuracy import compare_questions
+
+    result = compare_questions(backend, texts)
+    assert result['word_overlap_mean'] >= MIN_QUESTION_OVERLAP, result
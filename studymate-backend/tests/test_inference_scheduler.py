@@ -0,0 +1,132 @@
+import os
+import threading
+
+import pytest
+
+from inference_scheduler import MicroBatcher
+
+class StubModel:
+    """Doubles its inputs and records the batches it was given"""
+
+    def __init__(self, release: threading.Event = None):
+        self.batches = []
+        self.release = release
+        self.entered = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, inputs, key):
+        self.entered.set()
+        if self.release is not None:
+            self.release.wait(5)
+        with self.lock:
+            self.batches.append((list(inputs), key))
+        return [value * 2 for value in inputs]
+
+    def seen(self):
+        return [value for inputs, _ in self.batches for value in inputs]
+
+def _concurrently(count, fn):
+    """Run fn(i) on count threads started together, returns results by i"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+def test_concurrent_callers_get_their_own_results_in_order():
+    model = StubModel()
+    batcher = MicroBatcher('test-order', model, max_batch=64, max_wait_ms=50)
+
+    results = _concurrently(8, lambda i: batcher([i * 100 + j for j in range(5)]))
+
+    for i, result in enumerate(results):
+        assert result == [(i * 100 + j) * 2 for j in range(5)]
+    # callers arriving within max_wait share forward passes
+    assert len(model.batches) < 8
+    batcher.shutdown()
+
+def test_batches_never_exceed_max_batch():
+    model = StubModel()
+    batcher = MicroBatcher('test-max-batch', model, max_batch=4, max_wait_ms=50)
+
+    results = _concurrently(5, lambda i: batcher([i] * 3))
+
+    assert results == [[i * 2] * 3 for i in range(5)]
+    assert all(len(inputs) <= 4 for inputs, _ in model.batches)
+    batcher.shutdown()
+
+def test_callers_with_different_options_do_not_share_a_batch():
+    model = StubModel()
+    batcher = MicroBatcher('test-keys', model, max_batch=64, max_wait_ms=50)
+
+    # even callers pass one option, odd callers another
+    keys = [(('normalize', i % 2 == 0),) for i in range(6)]
+    results = _concurrently(6, lambda i: batcher([i, i], keys[i]))
+
+    assert results == [[i * 2, i * 2] for i in range(6)]
+    for inputs, key in model.batches:
+        assert all(keys[value] == key for value in inputs)
+    batcher.shutdown()
+
+def test_timeout_raises_and_drops_queued_inputs():
+    release = threading.Event()
+    model = StubModel(release)
+    batcher = MicroBatcher('test-timeout', model, max_batch=64, max_wait_ms=0)
+
+    # the first call holds the scheduler thread inside the model
+    first = batcher.submit([1])
+    assert model.entered.wait(5)
+    with pytest.raises(TimeoutError):
+        batcher([2, 3], timeout=0.1)
+
+    release.set()
+    assert first.result(5) == [2]
+    # inputs queued after the timeout still run, the timed out ones never do
+    assert batcher([4], timeout=5) == [8]
+    assert 2 not in model.seen() and 3 not in model.seen()
+    batcher.shutdown()
+
+def test_model_errors_reach_every_caller_in_the_batch():
+    def fail(inputs, key):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher('test-errors', fail, max_batch=64, max_wait_ms=50)
+    results = _concurrently(3, lambda i: pytest.raises(ValueError, batcher, [i]))
+    assert all(result is not None for result in results)
+    batcher.shutdown()
+
+def test_shut_down_scheduler_rejects_inputs():
+    batcher = MicroBatcher('test-shutdown', StubModel(), max_batch=64, max_wait_ms=0)
+    assert batcher([1]) == [2]
+    batcher.shutdown()
+    with pytest.raises(RuntimeError):
+        batcher.submit([2])
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_scheduler_works_after_fork():
+    model = StubModel()
+    batcher = MicroBatcher('test-fork', model, max_batch=64, max_wait_ms=0)
+    # the parent's scheduler thread is running when the child is forked
+    assert batcher([1]) == [2]
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = 0 if batcher([5, 6], timeout=5) == [10, 12] else 1
+        finally:
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    # the parent's scheduler is untouched by the child
+    assert batcher([7]) == [14]
+    batcher.shutdown()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 import { Upload, Book, FileText, CheckCircle, ChevronLeft, ChevronRight, RotateCw, Trash2, Cloud } from 'lucide-react';
 
@@ -11,6 +11,8 @@ function App() {
   const [selectedFile, setSelectedFile] = useState(null);
   const [uploadStatus, setUploadStatus] = useState('');
   const [uploadedDocs, setUploadedDocs] = useState([]);
+  const [filesCursor, setFilesCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   
   // state for flashcards
@@ -19,6 +21,8 @@ function App() {
   const [currentCardIndex, setCurrentCardIndex] = useState(0);
   const [isFlipped, setIsFlipped] = useState(false);
   const [currentDocName, setCurrentDocName] = useState('');
+  // aborts the page loads of the deck being shown when another one replaces it
+  const deckLoader = useRef(null);
   
   // state for stats
   const [userStats, setUserStats] = useState({ total_files: 0, total_cards: 0 });
@@ -167,16 +171,22 @@ function App() {
     }
   }
 
-  // load user's files from backend
+  // fetch one page of the user's files, the first page without a cursor
+  async function fetchFilesPage(cursor) {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const response = await fetch(`${API_URL}/files${query}`, {
+      credentials: 'include'
+    });
+    return response.json();
+  }
+
+  // load the first page of the user's files, later pages load on demand
   async function loadUserFiles() {
     try {
-      const response = await fetch(`${API_URL}/files`, {
-        credentials: 'include'
-      });
-      const data = await response.json();
-      
+      const data = await fetchFilesPage(null);
       if (data.files) {
         setUploadedDocs(data.files);
+        setFilesCursor(data.next_cursor);
         console.log(`Loaded ${data.files.length} files`);
       }
       
@@ -187,6 +197,25 @@ function App() {
     }
   }
 
+  // append the next page of files
+  async function loadMoreFiles() {
+    if (!filesCursor || isLoadingMore) {
+      return;
+    }
+    setIsLoadingMore(true);
+    try {
+      const data = await fetchFilesPage(filesCursor);
+      if (data.files) {
+        setUploadedDocs((docs) => docs.concat(data.files));
+        setFilesCursor(data.next_cursor);
+      }
+    } catch (error) {
+      console.error('Error loading more files:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  }
+
   // load user statistics
   async function loadStats() {
     try {
@@ -244,10 +273,11 @@ function App() {
         setSelectedFile(null);
         document.getElementById('fileInput').value = '';
         
-        // reload files
+        // reload files, then again once the flashcards are generated
         loadUserFiles();
+        waitForJob(data.job_id);
         
-        console.log(`Uploaded with ${data.flashcard_count} flashcards`);
+        console.log(`Uploaded, generating flashcards in job ${data.job_id}`);
       } else {
         alert('Upload failed: ' + data.message);
         setUploadStatus('');
@@ -261,31 +291,107 @@ function App() {
     setIsUploading(false);
   }
 
+  // poll a flashcard generation job until it finishes
+  async function waitForJob(jobId) {
+    if (!jobId) {
+      return;
+    }
+    
+    try {
+      const response = await fetch(`${API_URL}/jobs/${jobId}`, {
+        credentials: 'include'
+      });
+      const data = await response.json();
+      
+      if (data.status !== 'success') {
+        return;
+      }
+      
+      if (data.job.state === 'queued' || data.job.state === 'running') {
+        setTimeout(() => waitForJob(jobId), 1500);
+        return;
+      }
+      
+      if (data.job.state === 'failed') {
+        console.error('Flashcard generation failed:', data.job.error);
+      } else {
+        console.log(`Generated ${data.job.flashcard_count} flashcards`);
+      }
+      loadUserFiles();
+    } catch (error) {
+      console.error('Error checking job:', error);
+    }
+  }
+
+  // stop loading the previous deck's pages
+  function stopDeckLoader() {
+    if (deckLoader.current) {
+      deckLoader.current.abort();
+      deckLoader.current = null;
+    }
+  }
+
   // view flashcards
   async function viewFlashcards(fileId, filename) {
+    stopDeckLoader();
+    const loader = new AbortController();
+    deckLoader.current = loader;
+    
     try {
       console.log('Loading flashcards for:', filename);
       
       const response = await fetch(`${API_URL}/flashcards/${fileId}`, {
-        credentials: 'include'
+        credentials: 'include',
+        signal: loader.signal
       });
       const data = await response.json();
       
+      if (loader.signal.aborted) {
+        return;
+      }
       if (data.status === 'success' && data.flashcards.length > 0) {
+        // show the first page right away, load the rest behind it
         setCurrentFlashcards(data.flashcards);
         setCurrentDocName(filename);
         setShowFlashcards(true);
         setCurrentCardIndex(0);
         setIsFlipped(false);
+        loadRemainingFlashcards(fileId, data.next_cursor, loader.signal);
       } else {
         alert('No flashcards found');
       }
     } catch (error) {
+      if (error.name === 'AbortError') {
+        return;
+      }
       console.error('Error loading flashcards:', error);
       alert('Could not load flashcards');
     }
   }
 
+  // append the remaining pages of a deck, until another deck is opened or the viewer closes
+  async function loadRemainingFlashcards(fileId, cursor, signal) {
+    try {
+      while (cursor && !signal.aborted) {
+        const response = await fetch(`${API_URL}/flashcards/${fileId}?cursor=${encodeURIComponent(cursor)}`, {
+          credentials: 'include',
+          signal
+        });
+        const data = await response.json();
+        
+        if (signal.aborted || data.status !== 'success') {
+          break;
+        }
+        setCurrentFlashcards(cards => cards.concat(data.flashcards));
+        cursor = data.next_cursor;
+      }
+    } catch (error) {
+      if (error.name !== 'AbortError') {
+        console.error('Error loading flashcards:', error);
+      }
+    }
+  }
+
   // delete file
   async function deleteDocument(fileId, filename) {
     if (!window.confirm(`Delete "${filename}"?`)) {
@@ -332,6 +438,7 @@ function App() {
   }
 
   function closeFlashcards() {
+    stopDeckLoader();
     setShowFlashcards(false);
     setCurrentFlashcards([]);
     setCurrentCardIndex(0);
@@ -404,6 +511,7 @@ function App() {
               <div className="flashcard-back">
                 <div className="card-label">Answer</div>
                 <div className="card-text">{currentCard.answer}</div>
+                {currentCard.page && <div className="card-label">Page {currentCard.page}</div>}
                 <div className="flip-hint">Click to flip back</div>
               </div>
             </div>
@@ -490,13 +598,13 @@ function App() {
             <p className="file-name">
               {selectedFile ? selectedFile.name : 'Choose a file'}
             </p>
-            <p className="file-info">Supported: TXT, PDF, DOC, DOCX (Max 16MB)</p>
+            <p className="file-info">Supported: TXT, PDF, DOCX, PPTX (Max 16MB)</p>
             
             <input
               id="fileInput"
               type="file"
               onChange={handleFileSelect}
-              accept=".pdf,.txt,.doc,.docx"
+              accept=".pdf,.txt,.docx,.pptx"
               style={{ display: 'none' }}
             />
             <label htmlFor="fileInput" className="browse-button">
@@ -568,6 +676,15 @@ function App() {
                 </div>
               ))}
             </div>
+            {filesCursor && (
+              <button 
+                onClick={loadMoreFiles} 
+                className="load-more-button"
+                disabled={isLoadingMore}
+              >
+                {isLoadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            )}
           </div>
         ) : (
           <div className="empty-state">